@@ -1,9 +1,11 @@
 import streamlit as st
 import altair as alt
 import pandas as pd
-from db.connection import get_mysql_engine
-from sqlalchemy import MetaData, Table, text
-from datetime import datetime
+from db import queries
+from db.connection import get_engine
+from db.rollup import average_window_start
+from sqlalchemy import MetaData, Table
+from datetime import date, datetime
 from zoneinfo import ZoneInfo
 
 # -------------------------
@@ -13,7 +15,7 @@ st.set_page_config(layout="wide", page_title="Deal Tracker", page_icon="🛒")
 
 st.title("🛒 Product Tracker")
 
-engine = get_mysql_engine()
+engine = get_engine(profile="dashboard-reader")
 
 # -------------------------
 # BUILD HTML
@@ -129,23 +131,8 @@ def render_table(df):
     return html
 
 
-query = text("""
-    SELECT report.id AS report_id, report.timestamp AS report_date, COUNT(*)
-    FROM price JOIN report ON price.report_id = report.id
-    WHERE report_id IN (
-        SELECT id FROM (
-            SELECT id
-            FROM report
-            ORDER BY timestamp DESC
-            LIMIT 2
-        ) AS latest_reports
-    )
-    GROUP BY report.id, report.timestamp
-    ORDER BY report.timestamp DESC
-""")
-
 with engine.begin() as connection:
-    result = connection.execute(query)
+    result = connection.execute(queries.LATEST_REPORTS).all()
 
 report_id_list = [
     {"report_id": row.report_id, "report_date": row.report_date} for row in result
@@ -163,34 +150,18 @@ st.caption(f"📅 Last updated: {report_date.strftime('%b %d, %Y %I:%M %p')}")
 # -------------------------
 # CURRENT PRICES
 # -------------------------
-current_query = f"""
-    SELECT report_id, product.id AS product_id, name AS Name, price AS price_num, store AS Store
-    FROM price JOIN product ON price.product_id = product.id
-    WHERE
-            report_id = "{report_id}"
-        AND price >= 0
-"""
-
-current_df = pd.read_sql(current_query, engine)
+current_df = pd.read_sql(
+    queries.CURRENT_PRICES, engine, params={"report_id": report_id}
+).rename(columns={"name": "Name", "store": "Store"})
 
 product_id_list = tuple(current_df["product_id"].tolist())
 
 # -------------------------
 # AVERAGE PRICES (3 months)
 # -------------------------
-avg_query = """
-    SELECT product_id AS product_id, ROUND(AVG(price), 2) AS avg_price_num
-    FROM price
-    WHERE report_id IN (
-        SELECT id
-        FROM report
-        WHERE
-            timestamp >= NOW() - INTERVAL 3 MONTH
-    )
-    GROUP BY product_id
-"""
-
-avg_df = pd.read_sql(avg_query, engine).set_index("product_id")
+avg_df = pd.read_sql(
+    queries.AVERAGE_PRICES, engine, params={"since": average_window_start()}
+).set_index("product_id")
 
 current_df = current_df.join(avg_df, on="product_id")
 
@@ -258,31 +229,21 @@ product = st.selectbox("🔎 Select product", product_list)
 # -------------------------
 # HISTORY QUERIES
 # -------------------------
-single_item_history_query = f"""
-    SELECT DATE(timestamp) AS Date, name AS Name, AVG(price) AS Price
-    FROM price
-    JOIN product ON price.product_id = product.id
-    JOIN report ON price.report_id = report.id
-    WHERE
-            product.name = "{product}"
-        AND price >= 0
-    GROUP BY DATE(timestamp), name
-"""
-
-all_item_history_query = f"""
-    SELECT DATE(timestamp) AS Date, AVG(price) AS Price
-    FROM price
-    JOIN product ON price.product_id = product.id
-    JOIN report ON price.report_id = report.id
-    WHERE
-            product.id IN {product_id_list}
-        AND price >= 0
-    GROUP BY DATE(timestamp)
-"""
-
-history_df = pd.read_sql(
-    all_item_history_query if product == "All" else single_item_history_query, engine
-)
+# Daily series from the price_daily rollup, so months whose raw prices
+# were archived and pruned still show up
+if product == "All":
+    history_ids = product_id_list
+else:
+    history_ids = current_df.loc[current_df["Name"] == product, "product_id"]
+
+with engine.begin() as connection:
+    result = queries.daily_history_for_products(
+        connection, history_ids, queries.HISTORY_EPOCH, date.today()
+    )
+    history_df = pd.DataFrame(result.all(), columns=list(result.keys()))
+
+history_df = history_df.rename(columns={"date": "Date", "price": "Price"})
+history_df["Price"] = history_df["Price"].astype(float)
 
 history_df["Date"] = pd.to_datetime(history_df["Date"])
 
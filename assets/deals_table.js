@@ -0,0 +1,37 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    deals: {
+        // Filter the deals table rows to the selected stores (all when
+        // none are selected) and sort them ascending by sortCol: cheapest
+        // price first, or most-discounted (most-negative) first. Rows
+        // without a value (no 3-month average yet) go last.
+        sortAndFilter: function (rows, sortCol, stores) {
+            if (!rows) {
+                return [];
+            }
+
+            var visible = rows;
+            if (stores && stores.length) {
+                visible = rows.filter(function (row) {
+                    return stores.indexOf(row.store) !== -1;
+                });
+            } else {
+                visible = rows.slice();
+            }
+
+            function missing(value) {
+                return value === null || value === undefined;
+            }
+
+            visible.sort(function (a, b) {
+                var x = a[sortCol];
+                var y = b[sortCol];
+                if (missing(x) || missing(y)) {
+                    return missing(x) - missing(y);
+                }
+                return x - y;
+            });
+
+            return visible;
+        }
+    }
+});
@@ -1,12 +1,22 @@
 #!/usr/bin/env python3
 
+import math
+import operator
+import os
+import re
 import dash
-from dash import dcc, html, dash_table, Input, Output
+from dash import ctx, dcc, html, dash_table, ClientsideFunction, Input, Output, State
 import plotly.express as px
 import pandas as pd
-from sqlalchemy import text
+from datetime import date, datetime
+from dotenv import load_dotenv
 from zoneinfo import ZoneInfo
-from db.connection import get_mysql_engine
+from dateutil.relativedelta import relativedelta
+from db import queries
+from db.connection import get_engine
+from db.rollup import average_window_start
+from downsample import downsample_series
+from report_cache import cached, lookup, report_cache_key
 
 # -------------------------
 # APP INIT
@@ -15,7 +25,15 @@ from db.connection import get_mysql_engine
 app = dash.Dash(__name__, title="Deal Tracker")
 server = app.server  # expose for gunicorn / deployment
 
-engine = get_mysql_engine()
+engine = get_engine(profile="dashboard-reader")
+
+# history-range options -> months back from today (None: everything)
+HISTORY_RANGES = {"3M": 3, "1Y": 12, "All": None}
+
+# Long ranges are downsampled to about one point per this many pixels of
+# chart width; HISTORY_POINT_BUDGET applies until the browser reports it
+HISTORY_PX_PER_POINT = 3
+HISTORY_POINT_BUDGET = 350
 
 
 # -------------------------
@@ -26,54 +44,62 @@ engine = get_mysql_engine()
 def fetch_current_data():
     """
     Load the most recent report, current prices, and 3-month averages.
-    Returns (current_df, report_date).
+    Returns (current_df, report_date, cache_key).
+
+    Cached on disk per report and shared by all workers (see
+    report_cache.py), so only the first request after a tracker write
+    runs the queries below. The key is what data-store holds.
     """
 
-    report_query = text("""
-        SELECT report.id AS report_id, report.timestamp AS report_date, COUNT(*)
-        FROM price JOIN report ON price.report_id = report.id
-        WHERE report_id IN (
-            SELECT id FROM (
-                SELECT id
-                FROM report
-                ORDER BY timestamp DESC
-                LIMIT 2
-            ) AS latest_reports
-        )
-        GROUP BY report.id, report.timestamp
-        ORDER BY report.timestamp DESC
-    """)
+    since = average_window_start()
+    key = report_cache_key(engine, since)
 
-    with engine.begin() as conn:
-        row = conn.execute(report_query).first()
+    current_df = cached("current", key, lambda: query_current_data(since))
 
-    report_id = row.report_id
-    report_date = row.report_date.replace(tzinfo=ZoneInfo("UTC")).astimezone(
-        ZoneInfo("America/Los_Angeles")
+    report_date = (
+        datetime.fromisoformat(current_df.attrs["report_date"])
+        .replace(tzinfo=ZoneInfo("UTC"))
+        .astimezone(ZoneInfo("America/Los_Angeles"))
     )
+    return current_df, report_date, key
 
-    current_query = f"""
-        SELECT
-            product.id  AS product_id,
-            name,
-            price       AS price_num,
-            store
-        FROM price
-        JOIN product ON price.product_id = product.id
-        WHERE report_id = "{report_id}"
-            AND price >= 0
+
+def resolve_current_data(key):
     """
-    current_df = pd.read_sql(current_query, engine)
+    Resolve a data-store key to its current_df.
 
-    avg_query = """
-        SELECT product_id, ROUND(AVG(price), 2) AS avg_price_num
-        FROM price
-        WHERE report_id IN (
-            SELECT id FROM report WHERE timestamp >= NOW() - INTERVAL 3 MONTH
-        )
-        GROUP BY product_id
+    Served from this worker's memory, then the shared disk cache; a key
+    that has aged out of both (a newer report landed) loads the latest
+    data instead.
+    """
+
+    current_df = lookup("current", key) if key else None
+    if current_df is None:
+        return fetch_current_data()[0]
+
+    return current_df
+
+
+def query_current_data(since):
+    """
+    Run the queries behind fetch_current_data().
+
+    The report's (UTC) timestamp travels with the frame, as the ISO string
+    in attrs["report_date"], so the disk cache stores a single frame.
     """
-    avg_df = pd.read_sql(avg_query, engine).set_index("product_id")
+
+    with engine.begin() as conn:
+        row = conn.execute(queries.LATEST_REPORTS).first()
+
+    report_id = row.report_id
+
+    current_df = pd.read_sql(
+        queries.CURRENT_PRICES, engine, params={"report_id": report_id}
+    )
+
+    avg_df = pd.read_sql(
+        queries.AVERAGE_PRICES, engine, params={"since": since}
+    ).set_index("product_id")
     current_df = current_df.join(avg_df, on="product_id")
 
     # Derived metrics
@@ -93,51 +119,112 @@ def fetch_current_data():
             return f"[View]({url})"
 
     current_df["buy_link"] = current_df.apply(buy_link, axis=1)
+    current_df.attrs["report_date"] = row.report_date.isoformat()
 
-    return current_df, report_date
+    return current_df
 
 
-def fetch_history(product_name, product_id_list):
+def history_range(range_key):
     """
-    Load price history for one product or an aggregate of all products.
+    Map a history-range option to its (start, end) days, ending today.
     """
 
-    if product_name and product_name != "All":
-        query = f"""
-            SELECT DATE(timestamp) AS date, name, AVG(price) AS price
-            FROM price
-            JOIN product ON price.product_id = product.id
-            JOIN report  ON price.report_id  = report.id
-            WHERE product.name = "{product_name}"
-              AND price >= 0
-            GROUP BY DATE(timestamp), name
-        """
+    end = date.today()
+    months = HISTORY_RANGES[range_key]
+    if months is None:
+        return queries.HISTORY_EPOCH, end
+
+    return end - relativedelta(months=months), end
+
+
+def fetch_history(product_id, product_id_list, start, end):
+    """
+    Load daily price history for one product id or an aggregate of all
+    products, between the start and end days.
+
+    Read from the price_daily rollup, which keeps every day even once raw
+    prices are archived and pruned, so this is one row per day.
+    """
+
+    params = {"start": start, "end": end}
+
+    if product_id and product_id != "All":
+        df = pd.read_sql(
+            queries.DAILY_HISTORY_SINGLE,
+            engine,
+            params={"product_id": product_id, **params},
+        )
     else:
-        ids = tuple(product_id_list)
-        if not ids:
+        if not product_id_list:
             return pd.DataFrame(columns=["date", "price"])
-        ids_sql = f"('{ids[0]}')" if len(ids) == 1 else str(ids)
-        query = f"""
-            SELECT DATE(timestamp) AS date, AVG(price) AS price
-            FROM price
-            JOIN product ON price.product_id = product.id
-            JOIN report  ON price.report_id  = report.id
-            WHERE product.id IN {ids_sql}
-              AND price >= 0
-            GROUP BY DATE(timestamp)
-            ORDER BY DATE(timestamp)
-        """
-
-    df = pd.read_sql(query, engine)
+        with engine.begin() as conn:
+            result = queries.daily_history_for_products(
+                conn, product_id_list, start, end
+            )
+            df = pd.DataFrame(result.all(), columns=list(result.keys()))
+
     df["date"] = pd.to_datetime(df["date"])
+    df["price"] = df["price"].astype(float)
 
-    # Ensure "all products" path returns a single averaged series (one row per date)
-    if not (product_name and product_name != "All"):
-        df = df.groupby("date", as_index=False)["price"].mean()
+    return df
+
+
+def filter_table(df, filter_query):
+    """
+    Apply a DataTable filter_query ("{col} op value" clauses joined by
+    " && ") to df. Clauses it does not understand are ignored.
+    """
+
+    for clause in filter(None, (filter_query or "").split(" && ")):
+        match = TABLE_FILTER_CLAUSE.match(clause.strip())
+        if not match:
+            continue
+
+        column = match["column"]
+        op = match["op"].lstrip("s").strip()
+        value = match["value"].strip()
+        if len(value) > 1 and value[0] == value[-1] and value[0] in "\"'`":
+            value = value[1:-1]
+
+        if column not in df.columns:
+            continue
+
+        if op in ("contains", "datestartswith"):
+            text = df[column].astype(str).str.lower()
+            if op == "contains":
+                df = df[text.str.contains(value.lower(), regex=False)]
+            else:
+                df = df[text.str.startswith(value.lower())]
+            continue
+
+        if column in TABLE_NUMERIC_SOURCES:
+            column, scale = TABLE_NUMERIC_SOURCES[column]
+            try:
+                value = float(value.strip("$%+ ").replace(",", "")) / scale
+            except ValueError:
+                continue
+
+        df = df[TABLE_FILTER_OPERATORS[op](df[column], value)]
 
     return df
 
 
+def sort_table(df, sort_by, default_col):
+    """
+    Sort df by the DataTable sort_by, or ascending by default_col when no
+    header sort is set. Rows without a value go last either way.
+    """
+
+    if sort_by:
+        column = sort_by[0]["column_id"]
+        column = TABLE_NUMERIC_SOURCES.get(column, (column,))[0]
+        ascending = sort_by[0]["direction"] == "asc"
+    else:
+        column, ascending = default_col, True
+
+    return df.sort_values(column, ascending=ascending, na_position="last")
+
+
 # -------------------------
 # HELPERS
 # -------------------------
@@ -192,6 +279,52 @@ TABLE_COLUMNS = [
     {"name": "", "id": "pct_change", "type": "numeric"},  # hidden; drives row coloring
 ]
 
+# "client" sends every row and pages / sorts / filters in the browser;
+# "server" pages, sorts and filters the cached frame and sends only the
+# visible page, for catalogs too large to ship whole
+load_dotenv()
+DEALS_TABLE_MODE = os.getenv("DEALS_TABLE_MODE", "client")
+
+DEALS_TABLE_OPTIONS = (
+    {
+        "page_action": "custom",
+        "page_current": 0,
+        "sort_action": "custom",
+        "sort_mode": "single",
+        "sort_by": [],
+        "filter_action": "custom",
+        "filter_query": "",
+    }
+    if DEALS_TABLE_MODE == "server"
+    else {}
+)
+
+# Formatted columns sort and filter on their numeric source, scaled the way
+# they are displayed (pct_fmt shows pct_change as a percentage)
+TABLE_NUMERIC_SOURCES = {"price_fmt": ("price_num", 1), "pct_fmt": ("pct_change", 100)}
+
+TABLE_FILTER_OPERATORS = {
+    ">=": operator.ge,
+    "<=": operator.le,
+    "<": operator.lt,
+    ">": operator.gt,
+    "!=": operator.ne,
+    "=": operator.eq,
+    "ge": operator.ge,
+    "le": operator.le,
+    "lt": operator.lt,
+    "gt": operator.gt,
+    "ne": operator.ne,
+    "eq": operator.eq,
+}
+
+# One clause of a DataTable filter_query, e.g. {name} contains "matrix"
+TABLE_FILTER_CLAUSE = re.compile(
+    r"^\{(?P<column>[^}]+)\}\s*"
+    r"(?P<op>s?(?:>=|<=|!=|<|>|=|ge |le |lt |gt |ne |eq |contains |datestartswith ))"
+    r"\s*(?P<value>.*)$"
+)
+
 TABLE_STYLE_CONDITIONAL = [
     # Alternating rows
     {"if": {"row_index": "odd"}, "backgroundColor": "#f9fafb"},
@@ -223,6 +356,8 @@ app.layout = html.Div(
     [
         dcc.Interval(id="refresh-interval", interval=10 * 60 * 1000, n_intervals=0),
         dcc.Store(id="data-store"),
+        dcc.Store(id="table-data"),
+        dcc.Store(id="chart-width"),
         # --- Dark header ---
         html.Div(
             html.Div(
@@ -403,6 +538,7 @@ app.layout = html.Div(
                             style_data={"backgroundColor": "white"},
                             style_data_conditional=TABLE_STYLE_CONDITIONAL,
                             page_size=25,
+                            **DEALS_TABLE_OPTIONS,
                             markdown_options={"link_target": "_blank"},
                         ),
                         style={"overflowX": "auto"},
@@ -430,15 +566,30 @@ app.layout = html.Div(
                         "margin": "0 0 12px",
                     },
                 ),
-                dcc.Dropdown(
-                    id="product-dropdown",
-                    value="All",
-                    clearable=False,
-                    style={
-                        "fontSize": "14px",
-                        "maxWidth": "480px",
-                        "marginBottom": "16px",
-                    },
+                html.Div(
+                    [
+                        dcc.Dropdown(
+                            id="product-dropdown",
+                            value="All",
+                            clearable=False,
+                            style={
+                                "fontSize": "14px",
+                                "width": "480px",
+                                "maxWidth": "100%",
+                            },
+                        ),
+                        dcc.RadioItems(
+                            id="history-range",
+                            options=[
+                                {"label": "3M", "value": "3M"},
+                                {"label": "1Y", "value": "1Y"},
+                                {"label": "All", "value": "All"},
+                            ],
+                            value="All",
+                        ),
+                    ],
+                    className="controls-row",
+                    style={"marginBottom": "16px"},
                 ),
                 html.Div(
                     dcc.Graph(id="history-chart", config={"displayModeBar": False}),
@@ -478,9 +629,7 @@ app.layout = html.Div(
 def refresh_data(_n):
     """Re-query the DB on load and every 10 minutes."""
 
-    df, report_date = fetch_current_data()
-
-    from datetime import datetime
+    df, report_date, key = fetch_current_data()
 
     today_pacific = datetime.now(ZoneInfo("America/Los_Angeles")).date()
     date_part = (
@@ -496,11 +645,12 @@ def refresh_data(_n):
 
     store_options = [{"label": s, "value": s} for s in sorted(df["store"].unique())]
     product_options = [{"label": "All products", "value": "All"}] + [
-        {"label": n, "value": n} for n in sorted(df["name"].unique())
+        {"label": f"{row.name} ({row.store})", "value": row.product_id}
+        for row in df.sort_values(["name", "store"]).itertuples()
     ]
 
     return (
-        df.to_json(date_format="iso", orient="split"),
+        key,
         last_updated,
         kpi_card("Best deal", f"{best_deal:.1%}", "#1d9e75"),
         kpi_card("Avg vs 3-mo", f"{avg_discount:.1%}", "#2C2C2A"),
@@ -510,49 +660,128 @@ def refresh_data(_n):
     )
 
 
-@app.callback(
-    Output("deals-table", "data"),
-    Input("data-store", "data"),
-    Input("sort-radio", "value"),
-    Input("store-filter", "value"),
-)
-def update_table(json_data, sort_col, stores):
-    """Re-sort and re-filter the deals table."""
+TABLE_RECORD_COLUMNS = [
+    "name",
+    "price_fmt",
+    "pct_fmt",
+    "store",
+    "buy_link",
+    "pct_change",
+    "price_num",
+]
 
-    if not json_data:
+
+def load_table(data_key):
+    """Send the deals table rows to the browser once per report."""
+
+    if not data_key:
         return []
 
-    df = pd.read_json(json_data, orient="split")
+    df = resolve_current_data(data_key)
+
+    return df[TABLE_RECORD_COLUMNS].to_dict("records")
+
+
+def page_table(
+    data_key, sort_col, stores, page_current, sort_by, filter_query, page_size
+):
+    """
+    Filter, sort and slice the cached frame down to the visible page.
+
+    Any change other than paging goes back to the first page.
+    """
+
+    if not data_key:
+        return [], 1, 0
+
+    if "deals-table.page_current" not in ctx.triggered_prop_ids:
+        page_current = 0
+
+    df = resolve_current_data(data_key)
 
     if stores:
         df = df[df["store"].isin(stores)]
 
-    # Ascending: cheapest price first, or most-discounted (most-negative) first
-    df = df.sort_values(sort_col, ascending=True)
+    df = filter_table(df, filter_query)
+    df = sort_table(df, sort_by, sort_col)
+
+    page_count = max(1, math.ceil(len(df) / page_size))
+    page_current = min(page_current or 0, page_count - 1)
+
+    start = page_current * page_size
+    page = df.iloc[start : start + page_size]
+
+    return page[TABLE_RECORD_COLUMNS].to_dict("records"), page_count, page_current
+
+
+if DEALS_TABLE_MODE == "server":
+    app.callback(
+        Output("deals-table", "data"),
+        Output("deals-table", "page_count"),
+        Output("deals-table", "page_current"),
+        Input("data-store", "data"),
+        Input("sort-radio", "value"),
+        Input("store-filter", "value"),
+        Input("deals-table", "page_current"),
+        Input("deals-table", "sort_by"),
+        Input("deals-table", "filter_query"),
+        State("deals-table", "page_size"),
+    )(page_table)
+
+else:
+    app.callback(
+        Output("table-data", "data"),
+        Input("data-store", "data"),
+    )(load_table)
+
+    # Sorting and store filtering run in the browser (assets/deals_table.js)
+    # on the rows load_table sent, so they need no round-trip
+    app.clientside_callback(
+        ClientsideFunction(namespace="deals", function_name="sortAndFilter"),
+        Output("deals-table", "data"),
+        Input("table-data", "data"),
+        Input("sort-radio", "value"),
+        Input("store-filter", "value"),
+    )
+
 
-    cols = ["name", "price_fmt", "pct_fmt", "store", "buy_link", "pct_change"]
-    return df[cols].to_dict("records")
+app.clientside_callback(
+    "function(_n) { return window.innerWidth; }",
+    Output("chart-width", "data"),
+    Input("refresh-interval", "n_intervals"),
+)
 
 
 @app.callback(
     Output("history-chart", "figure"),
     Input("product-dropdown", "value"),
+    Input("history-range", "value"),
     Input("data-store", "data"),
+    Input("chart-width", "data"),
 )
-def update_chart(product, json_data):
-    """Reload price history when the product selection changes."""
+def update_chart(product, range_key, data_key, width):
+    """Reload price history when the product or range selection changes."""
 
-    if not json_data:
+    if not data_key:
         return {}
 
     # Treat blank/None dropdown as "All"
     if not product:
         product = "All"
 
-    df = pd.read_json(json_data, orient="split")
+    df = resolve_current_data(data_key)
     pid_list = df["product_id"].tolist()
 
-    history_df = fetch_history(product_name=product, product_id_list=pid_list)
+    start, end = history_range(range_key or "All")
+    history_df = fetch_history(
+        product_id=product, product_id_list=pid_list, start=start, end=end
+    )
+
+    # The chart never shows more points than it has pixels for
+    budget = (
+        min(width, 1100) // HISTORY_PX_PER_POINT if width else HISTORY_POINT_BUDGET
+    )
+    history_df = downsample_series(history_df, "date", "price", budget)
 
     if history_df.empty:
         return px.line(title="No history available")
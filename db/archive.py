@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+# -----------------------------
+# Monthly Parquet archive
+# -----------------------------
+# Closed months of price rows (joined with their report timestamp and
+# product name / store) are exported to
+#
+#     $ARCHIVE_PATH/month=YYYY-MM/data.parquet
+#
+# sorted by product_id, so per-product scans skip most row groups via
+# their min/max statistics. Once a month is archived its price rows can be
+# pruned from the database; report rows and the price_daily rollup are
+# kept, so averages, report lookups and the dashboards' price history
+# (served from price_daily) are unaffected. The archive keeps the raw
+# rows for anything that needs per-report prices.
+#
+#     python -m db.archive            # export closed months not yet archived
+#     python -m db.archive --prune    # ...and delete their price rows
+
+import argparse
+import logging
+import os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from sqlalchemy import func, select
+from sqlalchemy.engine import Engine
+
+from db.tables import price_table, product_table, report_table
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_ARCHIVE_PATH = "archive/price"
+ARCHIVE_FILE = "data.parquet"
+
+EXPORT_CHUNK_ROWS = 10000
+ROW_GROUP_ROWS = 20000
+
+ARCHIVE_SCHEMA = pa.schema(
+    [
+        ("report_id", pa.string()),
+        ("timestamp", pa.timestamp("s")),
+        ("product_id", pa.string()),
+        ("name", pa.string()),
+        ("store", pa.string()),
+        ("price", pa.decimal128(10, 2)),
+    ]
+)
+
+
+def archive_root() -> Path:
+    load_dotenv()
+    return Path(os.getenv("ARCHIVE_PATH") or DEFAULT_ARCHIVE_PATH)
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(month: date) -> date:
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _month_dir(root: Path, month: date) -> Path:
+    return root / f"month={month:%Y-%m}"
+
+
+def archived_months(root: Optional[Path] = None) -> List[date]:
+    """Months with a complete archive file, oldest first."""
+    root = root or archive_root()
+    if not root.is_dir():
+        return []
+
+    months = []
+    for path in root.glob(f"month=*/{ARCHIVE_FILE}"):
+        months.append(datetime.strptime(path.parent.name[6:], "%Y-%m").date())
+
+    return sorted(months)
+
+
+# -----------------------------
+# Export / prune
+# -----------------------------
+def _month_range(month: date):
+    start = datetime.combine(month, datetime.min.time())
+    end = datetime.combine(_next_month(month), datetime.min.time())
+    return report_table.c.timestamp >= start, report_table.c.timestamp < end
+
+
+def _month_rows_query(month: date):
+    return (
+        select(
+            price_table.c.report_id,
+            report_table.c.timestamp,
+            price_table.c.product_id,
+            product_table.c.name,
+            product_table.c.store,
+            price_table.c.price,
+        )
+        .select_from(
+            price_table.join(
+                report_table, price_table.c.report_id == report_table.c.id
+            ).outerjoin(product_table, price_table.c.product_id == product_table.c.id)
+        )
+        .where(*_month_range(month))
+        .order_by(price_table.c.product_id, report_table.c.timestamp)
+    )
+
+
+def _count_month_rows(engine: Engine, month: date) -> int:
+    with engine.connect() as connection:
+        return connection.execute(
+            select(func.count())
+            .select_from(
+                price_table.join(
+                    report_table, price_table.c.report_id == report_table.c.id
+                )
+            )
+            .where(*_month_range(month))
+        ).scalar()
+
+
+def export_month(engine: Engine, month: date, root: Optional[Path] = None) -> int:
+    """
+    Write one month of price rows to its archive file. Returns rows written.
+
+    The file is written under a temporary name and renamed into place, so
+    a partial export never looks archived.
+    """
+    root = root or archive_root()
+    directory = _month_dir(root, month)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    path = directory / ARCHIVE_FILE
+    # Dot-prefixed, so dataset scans ignore it while it is being written
+    partial = directory / f".{ARCHIVE_FILE}.tmp"
+
+    rows = 0
+    with engine.connect() as connection, pq.ParquetWriter(
+        partial, ARCHIVE_SCHEMA
+    ) as writer:
+        result = connection.execution_options(yield_per=EXPORT_CHUNK_ROWS).execute(
+            _month_rows_query(month)
+        )
+
+        for chunk in result.mappings().partitions():
+            table = pa.Table.from_pylist([dict(row) for row in chunk], ARCHIVE_SCHEMA)
+            writer.write_table(table, row_group_size=ROW_GROUP_ROWS)
+            rows += len(chunk)
+
+    os.replace(partial, path)
+
+    logger.info("Archived %s: %d rows to %s", f"{month:%Y-%m}", rows, path)
+    return rows
+
+
+def prune_month(engine: Engine, month: date, root: Optional[Path] = None) -> int:
+    """
+    Delete an archived month's price rows from the database.
+
+    Skipped (returns 0) unless the database still holds exactly the rows
+    in the archive file, so rows that arrived after the export are kept.
+    """
+    root = root or archive_root()
+    archived = pq.ParquetFile(_month_dir(root, month) / ARCHIVE_FILE).metadata.num_rows
+    current = _count_month_rows(engine, month)
+
+    if current == 0:
+        return 0
+
+    if current != archived:
+        logger.warning(
+            "Not pruning %s: %d rows in the database, %d in the archive",
+            f"{month:%Y-%m}",
+            current,
+            archived,
+        )
+        return 0
+
+    with engine.begin() as connection:
+        report_ids = list(
+            connection.execute(
+                select(report_table.c.id).where(*_month_range(month))
+            ).scalars()
+        )
+
+    # One report per transaction keeps each delete (and its locks) short
+    for report_id in report_ids:
+        with engine.begin() as connection:
+            connection.execute(
+                price_table.delete().where(price_table.c.report_id == report_id)
+            )
+
+    logger.info("Pruned %s: %d rows", f"{month:%Y-%m}", current)
+    return current
+
+
+def archive_closed_months(
+    engine: Engine,
+    *,
+    prune: bool = False,
+    today: Optional[date] = None,
+    root: Optional[Path] = None,
+) -> None:
+    """
+    Archive every month before the current one that is not archived yet,
+    oldest first, and optionally prune archived months from the database.
+    """
+    root = root or archive_root()
+    current_month = _month_start(today or date.today())
+
+    with engine.connect() as connection:
+        first = connection.execute(select(func.min(report_table.c.timestamp))).scalar()
+
+    if first is None:
+        logger.info("No reports found — nothing to archive")
+        return
+
+    archived = set(archived_months(root))
+    month = _month_start(first.date())
+
+    while month < current_month:
+        if month not in archived:
+            export_month(engine, month, root)
+
+        if prune:
+            prune_month(engine, month, root)
+
+        month = _next_month(month)
+
+
+def main():
+    from db.connection import get_engine
+    from logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(
+        description="Archive closed months of prices to Parquet."
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="delete archived price rows from the database",
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+
+    archive_closed_months(get_engine(profile="scraper-writer"), prune=args.prune)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,212 @@
 import os
+import weakref
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
 
-from sqlalchemy import create_engine
-from sqlalchemy.engine import URL
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, Engine
 
+# -----------------------------
+# Backend selection
+# -----------------------------
+# DB_BACKEND picks the database every entry point talks to:
+#
+#     DB_BACKEND=mysql    (default) the shared product_tracker MySQL
+#     DB_BACKEND=sqlite   embedded file at DB_PATH
+#     DB_BACKEND=duckdb   embedded columnar file at DB_PATH (needs duckdb-engine)
+#
+# Embedded files use the same schema (see db/migrations.py) and can be
+# mirrored from MySQL with `python -m db.sync`.
+#
+# MYSQL_READ_HOST optionally points read-only profiles at a replica.
 
-def get_mysql_engine():
+BACKENDS = ("mysql", "sqlite", "duckdb")
 
+DEFAULT_DB_PATHS = {
+    "sqlite": "product_tracker.sqlite",
+    "duckdb": "product_tracker.duckdb",
+}
+
+# Seconds a SQLite connection waits on another writer's lock
+SQLITE_BUSY_TIMEOUT = 30
+
+
+# -----------------------------
+# Engine profiles
+# -----------------------------
+# Pool settings per role. Every gunicorn worker (and every Streamlit
+# process) holds its own pool, so the MySQL connection budget is roughly
+# workers x (pool_size + max_overflow) per dashboard.
+@dataclass(frozen=True)
+class EngineProfile:
+    pool_size: int
+    max_overflow: int
+    pool_pre_ping: bool  # test each connection on checkout
+    pool_recycle: int  # seconds; keep below the server's wait_timeout
+    read_timeout: Optional[int] = None  # seconds; fail a hung query instead of a worker
+    use_read_replica: bool = False  # connect to MYSQL_READ_HOST when set
+
+
+ENGINE_PROFILES = {
+    # The original settings, for callers that don't pick a role
+    "default": EngineProfile(
+        pool_size=5,
+        max_overflow=10,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+    ),
+    # One tracker run: the main thread plus one PriceWriter flush per
+    # store. Runs are hours apart, so ping before reusing a connection.
+    "scraper-writer": EngineProfile(
+        pool_size=3,
+        max_overflow=2,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+    ),
+    # Dashboard workers serve one request at a time and are busy often
+    # enough that recycling beats a ping round trip on every checkout.
+    "dashboard-reader": EngineProfile(
+        pool_size=2,
+        max_overflow=1,
+        pool_pre_ping=False,
+        pool_recycle=1800,
+        read_timeout=30,
+        use_read_replica=True,
+    ),
+}
+
+# Engines created in this process, disposed in forked children
+_engines = weakref.WeakSet()
+
+
+def _dispose_engines_after_fork() -> None:
+    # The child must not reuse the parent's sockets; close=False leaves
+    # them open for the parent and just drops them from the child's pool
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_dispose_engines_after_fork)
+
+
+def get_mysql_engine(profile: str = "default") -> Engine:
+    """
+    Create a MySQL engine with the pool settings of `profile`
+    (see ENGINE_PROFILES).
+
+    Raises:
+        ValueError: if the profile is unknown
+    """
     load_dotenv()
 
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(
+            f"Unknown engine profile {profile!r} "
+            f"(expected one of {', '.join(ENGINE_PROFILES)})"
+        )
+
+    settings = ENGINE_PROFILES[profile]
+
+    host = os.getenv("MYSQL_HOST")
+    if settings.use_read_replica:
+        host = os.getenv("MYSQL_READ_HOST") or host
+
+    connect_args = {}
+    if settings.read_timeout is not None:
+        connect_args["read_timeout"] = settings.read_timeout
+
     connection_url = URL.create(
         "mysql+pymysql",
         username=os.getenv("MYSQL_USERNAME"),
         password=os.getenv("MYSQL_PASSWORD"),
-        host=os.getenv("MYSQL_HOST"),
+        host=host,
         database="product_tracker",
     )
     engine = create_engine(
         connection_url,
-        pool_size=5,
-        max_overflow=10,
-        pool_pre_ping=True,
-        pool_recycle=3600,
+        pool_size=settings.pool_size,
+        max_overflow=settings.max_overflow,
+        pool_pre_ping=settings.pool_pre_ping,
+        pool_recycle=settings.pool_recycle,
+        connect_args=connect_args,
+    )
+    _engines.add(engine)
+
+    return engine
+
+
+def _enable_sqlite_wal(dbapi_connection, connection_record) -> None:
+    # WAL lets the dashboards read while the tracker is writing
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+
+def get_embedded_engine(backend: str, path: str = None) -> Engine:
+    """
+    Create an engine for an embedded SQLite or DuckDB file.
+
+    The file (and its directory) is created on first connect; run
+    `migrate(engine)` or `python -m db.sync` to create the schema.
+
+    Raises:
+        ValueError: if `backend` is not an embedded backend
+        RuntimeError: if DuckDB is requested but duckdb-engine is missing
+    """
+    load_dotenv()
+
+    if backend not in DEFAULT_DB_PATHS:
+        raise ValueError(f"Unknown embedded backend {backend!r}")
+
+    path = path or os.getenv("DB_PATH") or DEFAULT_DB_PATHS[backend]
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+    if backend == "duckdb":
+        try:
+            import duckdb_engine  # noqa: F401
+        except ImportError as exc:
+            raise RuntimeError(
+                "DB_BACKEND=duckdb requires the duckdb-engine package "
+                "(pip install duckdb-engine)"
+            ) from exc
+
+        engine = create_engine(URL.create("duckdb", database=str(path)))
+        _engines.add(engine)
+        return engine
+
+    engine = create_engine(
+        URL.create("sqlite", database=str(path)),
+        connect_args={"timeout": SQLITE_BUSY_TIMEOUT},
     )
+    event.listen(engine, "connect", _enable_sqlite_wal)
+    _engines.add(engine)
 
     return engine
+
+
+def get_engine(backend: str = None, profile: str = "default") -> Engine:
+    """
+    Create an engine for `backend`, or for DB_BACKEND if not given.
+
+    `profile` picks the MySQL pool settings (see ENGINE_PROFILES); embedded
+    backends have no server connections to budget and ignore it.
+
+    Raises:
+        ValueError: if the backend or profile is unknown
+    """
+    load_dotenv()
+
+    backend = (backend or os.getenv("DB_BACKEND") or "mysql").lower()
+
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown DB_BACKEND {backend!r} (expected one of {', '.join(BACKENDS)})"
+        )
+
+    if backend == "mysql":
+        return get_mysql_engine(profile)
+
+    return get_embedded_engine(backend)
@@ -0,0 +1,45 @@
+from typing import Dict, List, Sequence
+
+from sqlalchemy import Table
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+
+# -----------------------------
+# Dialect-specific statements
+# -----------------------------
+# MySQL spells upserts ON DUPLICATE KEY UPDATE; SQLite and DuckDB use the
+# PostgreSQL ON CONFLICT form. Writers build statements here so the same
+# code runs against every backend in db/connection.py.
+
+
+def upsert(
+    connection: Connection,
+    table: Table,
+    rows: List[Dict],
+    update_columns: Sequence[str],
+) -> None:
+    """
+    Insert `rows`, updating `update_columns` where the primary key exists.
+    """
+    if not rows:
+        return
+
+    dialect = connection.dialect.name
+
+    if dialect == "mysql":
+        statement = mysql_insert(table).values(rows)
+        statement = statement.on_duplicate_key_update(
+            {column: statement.inserted[column] for column in update_columns}
+        )
+
+    else:
+        insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        statement = insert(table).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[column.name for column in table.primary_key],
+            set_={column: statement.excluded[column] for column in update_columns},
+        )
+
+    connection.execute(statement)
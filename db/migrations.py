@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+
+# -----------------------------
+# Schema migrations
+# -----------------------------
+# Ordered, idempotent schema steps recorded in `schema_migrations`. Every
+# tracker run applies whatever is pending, so the scraper VM never needs a
+# manual DDL step. Run by hand with:
+#
+#     python -m db.migrations upgrade
+#     python -m db.migrations explain   # flag full scans in reader queries
+
+import argparse
+import logging
+import sys
+from datetime import date, datetime
+from typing import Callable, Dict, List, Set, Tuple
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Index,
+    MetaData,
+    String,
+    Table,
+    inspect,
+    text,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql import Executable
+
+from db import queries
+from db.rollup import average_window_start
+from db.tables import (
+    metadata,
+    price_daily_table,
+    price_table,
+    product_table,
+    report_table,
+)
+
+logger = logging.getLogger(__name__)
+
+
+schema_migrations_table = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", String(64), primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+# -----------------------------
+# Migration steps
+# -----------------------------
+def _create_base_tables(connection: Connection) -> None:
+    metadata.create_all(
+        connection,
+        tables=[report_table, product_table, price_table],
+        checkfirst=True,
+    )
+
+
+def _add_product_url_kind(connection: Connection) -> None:
+    columns = {column["name"] for column in inspect(connection).get_columns("product")}
+
+    if "url_kind" not in columns:
+        connection.execute(
+            text("ALTER TABLE product ADD COLUMN url_kind VARCHAR(16) NULL")
+        )
+
+
+def _create_price_daily(connection: Connection) -> None:
+    price_daily_table.create(connection, checkfirst=True)
+
+
+def _existing_indexes(connection: Connection, table_name: str) -> Set[str]:
+    # duckdb-engine does not reflect indexes; ask DuckDB's catalog instead
+    if connection.dialect.name == "duckdb":
+        return set(
+            connection.execute(
+                text(
+                    "SELECT index_name FROM duckdb_indexes() WHERE table_name = :table"
+                ),
+                {"table": table_name},
+            ).scalars()
+        )
+
+    return {index["name"] for index in inspect(connection).get_indexes(table_name)}
+
+
+def _primary_key(connection: Connection, table_name: str) -> List[str]:
+    # duckdb-engine does not reflect primary keys either
+    if connection.dialect.name == "duckdb":
+        return list(
+            connection.execute(
+                text(
+                    "SELECT constraint_column_names FROM duckdb_constraints()"
+                    " WHERE table_name = :table AND constraint_type = 'PRIMARY KEY'"
+                ),
+                {"table": table_name},
+            ).scalar()
+            or []
+        )
+
+    return inspect(connection).get_pk_constraint(table_name)["constrained_columns"]
+
+
+def _create_hot_path_indexes(connection: Connection) -> None:
+    for table in (report_table, product_table, price_table, price_daily_table):
+        existing = _existing_indexes(connection, table.name)
+
+        for index in table.indexes:
+            if index.name not in existing:
+                logger.info("Creating index %s on %s", index.name, table.name)
+                index.create(connection)
+
+
+def _add_report_completed_at(connection: Connection) -> None:
+    columns = {column["name"] for column in inspect(connection).get_columns("report")}
+
+    if "completed_at" not in columns:
+        connection.execute(
+            text("ALTER TABLE report ADD COLUMN completed_at DATETIME NULL")
+        )
+
+    # Reports that predate the column were written in one go at the end of
+    # their run, so they are complete as they stand
+    connection.execute(
+        report_table.update()
+        .where(report_table.c.completed_at.is_(None))
+        .values(completed_at=report_table.c.timestamp)
+    )
+
+
+def _drop_redundant_price_index(connection: Connection) -> None:
+    # ix_price_report_product_price repeated the (report_id, product_id)
+    # primary key, which already serves "prices in report X". Keep it on a
+    # table whose primary key differs, since it is then the only index
+    # leading on report_id.
+    primary_key = _primary_key(connection, "price")
+
+    if primary_key != ["report_id", "product_id"]:
+        logger.warning(
+            "price primary key is %s, not (report_id, product_id); "
+            "keeping ix_price_report_product_price",
+            primary_key,
+        )
+        return
+
+    if "ix_price_report_product_price" in _existing_indexes(connection, "price"):
+        logger.info("Dropping index ix_price_report_product_price on price")
+        # Built on a detached table so price_table does not declare it again
+        dropped = Table("price", MetaData(), Column("report_id", String(16)))
+        Index("ix_price_report_product_price", dropped.c.report_id).drop(connection)
+
+
+MIGRATIONS: List[Tuple[str, Callable[[Connection], None]]] = [
+    ("001_base_tables", _create_base_tables),
+    ("002_product_url_kind", _add_product_url_kind),
+    ("003_price_daily", _create_price_daily),
+    ("004_hot_path_indexes", _create_hot_path_indexes),
+    ("005_report_completed_at", _add_report_completed_at),
+    ("006_drop_redundant_price_index", _drop_redundant_price_index),
+]
+
+
+def migrate(engine: Engine) -> None:
+    """
+    Apply every migration not yet recorded in `schema_migrations`.
+    """
+    schema_migrations_table.create(engine, checkfirst=True)
+
+    with engine.begin() as connection:
+        applied = {
+            row.version for row in connection.execute(schema_migrations_table.select())
+        }
+
+    for version, step in MIGRATIONS:
+        if version in applied:
+            continue
+
+        logger.info("Applying migration %s", version)
+
+        with engine.begin() as connection:
+            step(connection)
+            connection.execute(
+                schema_migrations_table.insert(),
+                {"version": version, "applied_at": datetime.now()},
+            )
+
+
+# -----------------------------
+# Query plan check
+# -----------------------------
+# The reader statements from db/queries.py, as run by dash_app.py, app.py
+# and send_tracker_results.py.
+EXPLAIN_QUERIES: Dict[str, Executable] = {
+    "latest_reports": queries.LATEST_REPORTS,
+    "current_report": queries.CURRENT_REPORT,
+    "current_prices": queries.CURRENT_PRICES,
+    "average_prices": queries.AVERAGE_PRICES,
+    "email_prices": queries.EMAIL_PRICES,
+    "email_average_prices": queries.EMAIL_AVERAGE_PRICES,
+    "daily_history_single": queries.DAILY_HISTORY_SINGLE,
+    "daily_history_all": queries.DAILY_HISTORY_ALL,
+}
+
+
+def _sample_params(connection: Connection) -> Dict:
+    report_id = connection.execute(
+        text(
+            "SELECT id FROM report WHERE completed_at IS NOT NULL"
+            " ORDER BY timestamp DESC, id DESC LIMIT 1"
+        )
+    ).scalar()
+    products = connection.execute(text("SELECT id, name FROM product LIMIT 50")).all()
+
+    return {
+        "since": average_window_start(),
+        "report_id": report_id or "",
+        "product_name": products[0].name if products else "",
+        "product_ids": [row.id for row in products] or [""],
+        "product_id": products[0].id if products else "",
+        "start": average_window_start(),
+        "end": date.today(),
+    }
+
+
+def explain(engine: Engine) -> List[str]:
+    """
+    EXPLAIN every reader query and flag full table scans.
+
+    Returns:
+        list: "<query>: <table>" for each full scan found
+    """
+    flagged: List[str] = []
+
+    with engine.connect() as connection:
+        params = _sample_params(connection)
+
+        for name, statement in EXPLAIN_QUERIES.items():
+            # EXPLAIN takes no bind parameters, so render the sample values
+            sql = statement.params(**params).compile(
+                dialect=connection.dialect,
+                compile_kwargs={"literal_binds": True},
+            )
+
+            rows = connection.exec_driver_sql(f"EXPLAIN {sql}").mappings().all()
+
+            for row in rows:
+                table = row.get("table") or ""
+
+                # Derived tables are materialized subqueries of a few rows
+                if row.get("type") == "ALL" and not table.startswith("<"):
+                    flagged.append(f"{name}: {table}")
+                    logger.warning(
+                        "%s: full scan of %s (rows=%s, key=%s)",
+                        name,
+                        table,
+                        row.get("rows"),
+                        row.get("key"),
+                    )
+                else:
+                    logger.info(
+                        "%s: %s via %s (type=%s, rows=%s)",
+                        name,
+                        table,
+                        row.get("key"),
+                        row.get("type"),
+                        row.get("rows"),
+                    )
+
+    return flagged
+
+
+def main():
+    from db.connection import get_engine
+    from logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Product Tracker schema tools.")
+    parser.add_argument("command", choices=["upgrade", "explain"])
+    args = parser.parse_args()
+
+    setup_logging()
+    engine = get_engine(profile="scraper-writer")
+
+    if args.command == "upgrade":
+        migrate(engine)
+        return
+
+    if engine.dialect.name != "mysql":
+        parser.error("explain reads MySQL query plans; set DB_BACKEND=mysql")
+
+    flagged = explain(engine)
+    if flagged:
+        logger.error("Full scans found in %d query plans", len(flagged))
+        sys.exit(1)
+
+    logger.info("No full scans found")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import logging
+import threading
+from time import monotonic
+from typing import Dict, List, Optional
+
+from sqlalchemy.engine import Engine
+
+from db.tables import price_table
+
+logger = logging.getLogger(__name__)
+
+
+PRICE_BATCH_SIZE = 25
+PRICE_FLUSH_SECONDS = 60.0
+
+# Stored for products whose page had no readable price; price is NOT NULL
+MISSING_PRICE = -1.0
+
+
+class PriceWriter:
+    """
+    Buffered writer for one report's price rows.
+
+    Rows are flushed as a single multi-row INSERT once `batch_size` rows are
+    buffered or `flush_interval` seconds have passed since the last flush,
+    and once more on exit (including when the scrape fails), so a crash
+    late in a run keeps everything scraped so far.
+
+        with PriceWriter(engine, report_id) as writer:
+            writer.add(product_id, price)
+
+    Thread-safe; `add` may be called from scraper worker threads.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        report_id: str,
+        *,
+        batch_size: int = PRICE_BATCH_SIZE,
+        flush_interval: float = PRICE_FLUSH_SECONDS,
+    ) -> None:
+        self.engine = engine
+        self.report_id = report_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+
+        self._rows: List[Dict] = []
+        self._last_flush = monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, product_id: str, price: Optional[float]) -> None:
+        """
+        Buffer one price row, flushing if the batch is full or stale.
+
+        A None price is stored as MISSING_PRICE.
+        """
+        with self._lock:
+            self._rows.append(
+                {
+                    "report_id": self.report_id,
+                    "product_id": product_id,
+                    "price": MISSING_PRICE if price is None else price,
+                }
+            )
+
+            if (
+                len(self._rows) >= self.batch_size
+                or monotonic() - self._last_flush >= self.flush_interval
+            ):
+                self._flush_locked()
+
+    def flush(self) -> None:
+        """Write every buffered row now."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        self._last_flush = monotonic()
+
+        if not self._rows:
+            return
+
+        rows, self._rows = self._rows, []
+
+        with self.engine.begin() as connection:
+            connection.execute(price_table.insert().values(rows))
+
+        self.written += len(rows)
+        logger.info(
+            "Flushed %d price rows for report %s (%d total)",
+            len(rows),
+            self.report_id,
+            self.written,
+        )
+
+    def __enter__(self) -> "PriceWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.flush()
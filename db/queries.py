@@ -0,0 +1,275 @@
+# -----------------------------
+# Reader statements
+# -----------------------------
+# Every query the dashboards and the email report run, built once as bound
+# SQLAlchemy Core statements. Values are always bind parameters, so each
+# statement compiles once per process (SQLAlchemy's compiled cache) and
+# renders the same SQL on every call, and nothing user-supplied is ever
+# pasted into SQL text.
+#
+# Product id lists use an expanding IN up to MAX_BOUND_IDS ids and a
+# temporary table join beyond that (see `daily_history_for_products`).
+
+from datetime import date
+from typing import Sequence
+
+from sqlalchemy import (
+    Column,
+    Date,
+    MetaData,
+    String,
+    Table,
+    bindparam,
+    func,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection, Result
+
+from db.tables import price_daily_table, price_table, product_table, report_table
+
+MAX_BOUND_IDS = 500
+
+# Start day of an all-time history range
+HISTORY_EPOCH = date(2000, 1, 1)
+
+_price_report = price_table.join(
+    report_table, price_table.c.report_id == report_table.c.id
+)
+_price_product = price_table.join(
+    product_table, price_table.c.product_id == product_table.c.id
+)
+
+
+# -----------------------------
+# Reports
+# -----------------------------
+# Readers only see completed reports: prices are flushed in batches while
+# the tracker runs, so a report still being written holds only some of
+# the products. "Latest" orders by timestamp, then id, so reports created
+# in the same second still resolve to one report.
+_completed = report_table.c.completed_at.is_not(None)
+
+CURRENT_REPORT = (
+    select(report_table.c.id, report_table.c.timestamp)
+    .where(_completed)
+    .order_by(report_table.c.timestamp.desc(), report_table.c.id.desc())
+    .limit(1)
+)
+
+_latest_report_ids = (
+    select(report_table.c.id)
+    .where(_completed)
+    .order_by(report_table.c.timestamp.desc(), report_table.c.id.desc())
+    .limit(2)
+    .subquery("latest_reports")
+)
+
+# The two newest completed reports that have prices, newest first
+LATEST_REPORTS = (
+    select(
+        report_table.c.id.label("report_id"),
+        report_table.c.timestamp.label("report_date"),
+        func.count().label("price_count"),
+    )
+    .select_from(_price_report)
+    .where(price_table.c.report_id.in_(select(_latest_report_ids.c.id)))
+    .group_by(report_table.c.id, report_table.c.timestamp)
+    .order_by(report_table.c.timestamp.desc(), report_table.c.id.desc())
+)
+
+
+# Cache-invalidation probe: the newest completed report, how many prices
+# it has (a run that joined the report may still add some after another
+# run completed it) and how many of that day's prices the rollup has
+# absorbed. Each part is an index lookup.
+_latest_report = (
+    select(report_table.c.id, report_table.c.timestamp)
+    .where(_completed)
+    .order_by(report_table.c.timestamp.desc(), report_table.c.id.desc())
+    .limit(1)
+    .subquery("latest_report")
+)
+
+LATEST_REPORT_PROBE = select(
+    _latest_report.c.id,
+    select(func.count())
+    .where(price_table.c.report_id == _latest_report.c.id)
+    .scalar_subquery()
+    .label("price_count"),
+    select(func.coalesce(func.sum(price_daily_table.c.price_count), 0))
+    .where(price_daily_table.c.day == func.date(_latest_report.c.timestamp))
+    .scalar_subquery()
+    .label("rolled_up"),
+)
+
+
+# -----------------------------
+# Prices
+# -----------------------------
+# Valid prices in :report_id
+CURRENT_PRICES = (
+    select(
+        product_table.c.id.label("product_id"),
+        product_table.c.name,
+        price_table.c.price.label("price_num"),
+        product_table.c.store,
+    )
+    .select_from(_price_product)
+    .where(
+        price_table.c.report_id == bindparam("report_id"),
+        price_table.c.price >= 0,
+    )
+)
+
+# Priced (> 0) products in :report_id, cheapest first, for the email
+EMAIL_PRICES = (
+    select(
+        product_table.c.name,
+        price_table.c.price,
+        product_table.c.id,
+        product_table.c.store,
+    )
+    .select_from(_price_product)
+    .where(
+        price_table.c.report_id == bindparam("report_id"),
+        price_table.c.price > 0,
+    )
+    .order_by(price_table.c.price)
+)
+
+# Per-product average since :since, from the price_daily rollup
+AVERAGE_PRICES = (
+    select(
+        price_daily_table.c.product_id,
+        func.round(
+            func.sum(price_daily_table.c.price_sum)
+            / func.sum(price_daily_table.c.price_count),
+            2,
+        ).label("avg_price_num"),
+    )
+    .where(price_daily_table.c.day >= bindparam("since"))
+    .group_by(price_daily_table.c.product_id)
+)
+
+# Like AVERAGE_PRICES, with the latest report's own price backed out so it
+# is compared against history only
+EMAIL_AVERAGE_PRICES = text("""
+    SELECT
+        daily.product_id AS id,
+        ROUND(
+            (daily.price_sum - COALESCE(latest.price, 0))
+            / NULLIF(
+                daily.price_count
+                - CASE WHEN latest.price IS NULL THEN 0 ELSE 1 END,
+                0
+            ),
+            2
+        ) AS average_price
+    FROM (
+        SELECT product_id, SUM(price_sum) AS price_sum, SUM(price_count) AS price_count
+        FROM price_daily
+        WHERE day >= :since
+        GROUP BY product_id
+    ) AS daily
+    LEFT JOIN (
+        SELECT product_id, price
+        FROM price
+        WHERE report_id = (
+            SELECT id FROM report
+            WHERE completed_at IS NOT NULL
+            ORDER BY timestamp DESC, id DESC
+            LIMIT 1
+        )
+          AND price >= 0
+    ) AS latest ON latest.product_id = daily.product_id
+""").bindparams(bindparam("since", type_=Date))
+
+
+# -----------------------------
+# History
+# -----------------------------
+# Chart series from the price_daily rollup: one row per day whatever the
+# number of reports, keyed by product id, over an explicit [:start, :end]
+# range of days. The single-product form is a primary key range scan.
+# price_daily is kept when raw prices are archived and pruned (see
+# db/archive.py), so these cover the full history.
+_daily_price = (
+    func.sum(price_daily_table.c.price_sum) / func.sum(price_daily_table.c.price_count)
+).label("price")
+
+# Daily average price of :product_id
+DAILY_HISTORY_SINGLE = (
+    select(price_daily_table.c.day.label("date"), _daily_price)
+    .where(
+        price_daily_table.c.product_id == bindparam("product_id"),
+        price_daily_table.c.day >= bindparam("start", type_=Date),
+        price_daily_table.c.day <= bindparam("end", type_=Date),
+    )
+    .group_by(price_daily_table.c.day)
+    .order_by(price_daily_table.c.day)
+)
+
+
+def _daily_history_all(product_filter):
+    return (
+        select(price_daily_table.c.day.label("date"), _daily_price)
+        .where(
+            product_filter,
+            price_daily_table.c.day >= bindparam("start", type_=Date),
+            price_daily_table.c.day <= bindparam("end", type_=Date),
+        )
+        .group_by(price_daily_table.c.day)
+        .order_by(price_daily_table.c.day)
+    )
+
+
+# Daily average price across :product_ids
+DAILY_HISTORY_ALL = _daily_history_all(
+    price_daily_table.c.product_id.in_(bindparam("product_ids", expanding=True))
+)
+
+_product_ids_table = Table(
+    "tmp_product_ids",
+    MetaData(),
+    Column("id", String(32), primary_key=True),
+    prefixes=["TEMPORARY"],
+)
+
+
+_DAILY_HISTORY_ALL_JOINED = _daily_history_all(
+    price_daily_table.c.product_id.in_(select(_product_ids_table.c.id))
+)
+
+
+def daily_history_for_products(
+    connection: Connection,
+    product_ids: Sequence[str],
+    start: date,
+    end: date,
+) -> Result:
+    """
+    Run DAILY_HISTORY_ALL for `product_ids` over [start, end].
+
+    Up to MAX_BOUND_IDS ids are bound as an expanding IN; larger lists are
+    loaded into a temporary table and joined, so the SQL text stays the
+    same size however many products are tracked.
+    """
+    product_ids = list(dict.fromkeys(product_ids))
+    params = {"start": start, "end": end}
+
+    if len(product_ids) <= MAX_BOUND_IDS:
+        return connection.execute(
+            DAILY_HISTORY_ALL, {"product_ids": product_ids, **params}
+        )
+
+    _product_ids_table.create(connection)
+    try:
+        connection.execute(
+            _product_ids_table.insert(), [{"id": pid} for pid in product_ids]
+        )
+        result = connection.execute(_DAILY_HISTORY_ALL_JOINED, params)
+        # Buffer the rows so the table can be dropped before they are read
+        return result.freeze()()
+    finally:
+        _product_ids_table.drop(connection)
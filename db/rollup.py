@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+# -----------------------------
+# Daily price rollup
+# -----------------------------
+# price_daily holds one row per (product, day) with the sum, count, min and
+# max of that day's valid prices. Readers compute multi-month averages as
+# SUM(price_sum) / SUM(price_count), which scales with products x days
+# rather than with raw price rows.
+#
+# The tracker refreshes the day of each new report at the end of its run.
+# To rebuild everything from the raw price table:
+#
+#     python -m db.rollup --backfill
+
+import argparse
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Optional
+
+from dateutil.relativedelta import relativedelta
+
+from sqlalchemy import DateTime, bindparam, func, select, text
+from sqlalchemy.engine import Engine
+
+from db.tables import report_table
+
+logger = logging.getLogger(__name__)
+
+
+BACKFILL_CHUNK_DAYS = 31
+
+# Readers average prices over this many months of price_daily
+AVERAGE_WINDOW_MONTHS = 3
+
+# Recomputes every (product, day) in [:start, :end) from raw prices, so
+# re-running it for the same range is idempotent
+_ROLLUP_SELECT = """
+    INSERT INTO price_daily
+        (product_id, day, price_sum, price_count, price_min, price_max)
+    SELECT
+        price.product_id,
+        DATE(report.timestamp),
+        SUM(price.price),
+        COUNT(*),
+        MIN(price.price),
+        MAX(price.price)
+    FROM price
+    JOIN report ON price.report_id = report.id
+    WHERE report.timestamp >= :start
+      AND report.timestamp <  :end
+      AND price.price >= 0
+    GROUP BY price.product_id, DATE(report.timestamp)
+"""
+
+ROLLUP_QUERY = text(_ROLLUP_SELECT + """
+    ON DUPLICATE KEY UPDATE
+        price_sum   = VALUES(price_sum),
+        price_count = VALUES(price_count),
+        price_min   = VALUES(price_min),
+        price_max   = VALUES(price_max)
+""").bindparams(bindparam("start", type_=DateTime), bindparam("end", type_=DateTime))
+
+# SQLite and DuckDB spell the upsert the PostgreSQL way
+EMBEDDED_ROLLUP_QUERY = text(_ROLLUP_SELECT + """
+    ON CONFLICT (product_id, day) DO UPDATE SET
+        price_sum   = excluded.price_sum,
+        price_count = excluded.price_count,
+        price_min   = excluded.price_min,
+        price_max   = excluded.price_max
+""").bindparams(bindparam("start", type_=DateTime), bindparam("end", type_=DateTime))
+
+
+def average_window_start(today: Optional[date] = None) -> date:
+    """
+    First day of the price-average window ending today.
+
+    Computed here rather than with NOW() - INTERVAL in SQL, which only
+    MySQL understands, so the readers bind it as :since on every backend.
+    """
+    today = today or date.today()
+    return today - relativedelta(months=AVERAGE_WINDOW_MONTHS)
+
+
+def _rollup_days(engine: Engine, start: date, end: date) -> int:
+    """Recompute the rollup for days in [start, end). Returns rows written."""
+    query = ROLLUP_QUERY if engine.dialect.name == "mysql" else EMBEDDED_ROLLUP_QUERY
+
+    with engine.begin() as connection:
+        result = connection.execute(
+            query,
+            {
+                "start": datetime.combine(start, time.min),
+                "end": datetime.combine(end, time.min),
+            },
+        )
+
+    return result.rowcount
+
+
+def update_price_rollup(engine: Engine, report_record: Dict) -> None:
+    """
+    Refresh the rollup for the day of the given report.
+    """
+    timestamp = report_record.get("timestamp")
+    if isinstance(timestamp, str):
+        timestamp = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+
+    day = timestamp.date()
+
+    logger.info("Updating price rollup for %s", day)
+    _rollup_days(engine, day, day + timedelta(days=1))
+    logger.info("Price rollup update complete")
+
+
+def backfill_price_rollup(engine: Engine) -> None:
+    """
+    Rebuild the rollup for every day that has raw price rows.
+    """
+    with engine.begin() as connection:
+        first, last = connection.execute(
+            select(
+                func.min(report_table.c.timestamp), func.max(report_table.c.timestamp)
+            )
+        ).one()
+
+    if first is None:
+        logger.warning("No reports found — nothing to backfill")
+        return
+
+    start = first.date()
+    end = last.date() + timedelta(days=1)
+
+    while start < end:
+        chunk_end = min(start + timedelta(days=BACKFILL_CHUNK_DAYS), end)
+        rows = _rollup_days(engine, start, chunk_end)
+        logger.info("Backfilled %s to %s (%d rows affected)", start, chunk_end, rows)
+        start = chunk_end
+
+    logger.info("Price rollup backfill complete")
+
+
+def main():
+    from db.connection import get_engine
+    from logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Maintain the price_daily rollup.")
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="rebuild price_daily from the raw price table",
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+
+    if args.backfill:
+        backfill_price_rollup(get_engine(profile="scraper-writer"))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
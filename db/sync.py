@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+# -----------------------------
+# Embedded mirror of MySQL
+# -----------------------------
+# Copies the shared MySQL database into an embedded SQLite or DuckDB file
+# with the same schema, so dashboards and local runs can point at it with
+# DB_BACKEND=sqlite|duckdb and skip the network. Re-running only copies
+# what changed:
+#
+#   - product is mirrored in full (a few hundred rows)
+#   - reports missing from the mirror are copied with their prices, and the
+#     newest RESYNC_REPORTS already mirrored (plus any mirrored before they
+#     were completed) are copied again in case they were still being
+#     written on the last sync
+#   - price_daily is refreshed for every day those reports fall on
+#
+#     python -m db.sync --backend duckdb --path data/product_tracker.duckdb
+
+import argparse
+import logging
+from typing import Dict, Iterable, List, Set
+
+from sqlalchemy import select
+from sqlalchemy.engine import Connection, Engine
+
+from db.dialects import upsert
+from db.migrations import migrate
+from db.tables import price_daily_table, price_table, product_table, report_table
+
+logger = logging.getLogger(__name__)
+
+
+SYNC_CHUNK_ROWS = 5000
+RESYNC_REPORTS = 2
+
+
+def _copy_rows(source: Connection, target: Connection, table, query) -> int:
+    """Stream `query` from source into `table` on target in chunks."""
+    copied = 0
+    result = source.execution_options(yield_per=SYNC_CHUNK_ROWS).execute(query)
+
+    for rows in result.mappings().partitions():
+        target.execute(table.insert(), [dict(row) for row in rows])
+        copied += len(rows)
+
+    return copied
+
+
+def _sync_products(source: Connection, target: Connection) -> None:
+    rows = [dict(row) for row in source.execute(product_table.select()).mappings()]
+    wanted = {row["id"] for row in rows}
+
+    existing = set(target.execute(select(product_table.c.id)).scalars())
+    removed = existing - wanted
+
+    upsert(target, product_table, rows, ["name", "store", "url_kind"])
+
+    if removed:
+        target.execute(product_table.delete().where(product_table.c.id.in_(removed)))
+
+    logger.info("Synced %d products (%d removed)", len(rows), len(removed))
+
+
+def _reports_to_copy(source: Connection, target: Connection) -> List[Dict]:
+    reports = [
+        dict(row)
+        for row in source.execute(
+            report_table.select().order_by(report_table.c.timestamp)
+        ).mappings()
+    ]
+
+    mirrored = target.execute(
+        select(report_table.c.id, report_table.c.completed_at).order_by(
+            report_table.c.timestamp.desc(), report_table.c.id.desc()
+        )
+    ).all()
+    stale = {row.id for row in mirrored[:RESYNC_REPORTS]}
+    stale |= {row.id for row in mirrored if row.completed_at is None}
+    mirrored = {row.id for row in mirrored}
+
+    return [r for r in reports if r["id"] not in mirrored or r["id"] in stale]
+
+
+def _sync_reports(source: Connection, target: Connection, reports: List[Dict]):
+    for report in reports:
+        target.execute(
+            price_table.delete().where(price_table.c.report_id == report["id"])
+        )
+        upsert(target, report_table, [report], ["timestamp", "completed_at"])
+
+        copied = _copy_rows(
+            source,
+            target,
+            price_table,
+            price_table.select().where(price_table.c.report_id == report["id"]),
+        )
+        logger.info("Synced report %s (%d prices)", report["id"], copied)
+
+
+def _sync_price_daily(source: Connection, target: Connection, days: Iterable) -> None:
+    days: Set = set(days)
+    if not days:
+        return
+
+    target.execute(price_daily_table.delete().where(price_daily_table.c.day.in_(days)))
+    copied = _copy_rows(
+        source,
+        target,
+        price_daily_table,
+        price_daily_table.select().where(price_daily_table.c.day.in_(days)),
+    )
+
+    logger.info("Synced price_daily for %d days (%d rows)", len(days), copied)
+
+
+def sync_database(source: Engine, target: Engine) -> None:
+    """
+    Bring `target` up to date with `source` (see the module comment).
+    """
+    migrate(target)
+
+    with source.connect() as source_connection, target.begin() as target_connection:
+        _sync_products(source_connection, target_connection)
+
+        reports = _reports_to_copy(source_connection, target_connection)
+        _sync_reports(source_connection, target_connection, reports)
+
+        _sync_price_daily(
+            source_connection,
+            target_connection,
+            (report["timestamp"].date() for report in reports),
+        )
+
+    logger.info("Sync complete (%d reports copied)", len(reports))
+
+
+def main():
+    from db.connection import DEFAULT_DB_PATHS, get_embedded_engine, get_mysql_engine
+    from logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(
+        description="Mirror the MySQL database into an embedded file."
+    )
+    parser.add_argument("--backend", choices=sorted(DEFAULT_DB_PATHS), default="sqlite")
+    parser.add_argument("--path", help="embedded database file (default: DB_PATH)")
+    args = parser.parse_args()
+
+    setup_logging()
+
+    sync_database(
+        get_mysql_engine("dashboard-reader"),
+        get_embedded_engine(args.backend, args.path),
+    )
+
+
+if __name__ == "__main__":
+    main()
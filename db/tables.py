@@ -0,0 +1,77 @@
+from sqlalchemy import (
+    Column,
+    Date,
+    DateTime,
+    Index,
+    Integer,
+    MetaData,
+    Numeric,
+    String,
+    Table,
+)
+
+# -----------------------------
+# Table registry
+# -----------------------------
+# Declared once per process and shared by every reader / writer, instead of
+# reflecting with autoload_with=engine (a round of information_schema
+# queries against the remote MySQL) on each call.
+
+metadata = MetaData()
+
+report_table = Table(
+    "report",
+    metadata,
+    Column("id", String(16), primary_key=True),
+    Column("timestamp", DateTime, nullable=False),
+    # Set once the tracker run has written all its prices and rolled them
+    # up; readers only show completed reports
+    Column("completed_at", DateTime, nullable=True),
+    # Latest-report lookups: ORDER BY timestamp DESC, id DESC LIMIT n
+    Index("ix_report_timestamp_id", "timestamp", "id"),
+)
+
+product_table = Table(
+    "product",
+    metadata,
+    Column("id", String(32), primary_key=True),
+    Column("name", String(512), nullable=False),
+    Column("store", String(32), nullable=False),
+    Column("url_kind", String(16), nullable=True),  # Apple TV: movies / seasons
+    # Single-product history lookups by name
+    Index("ix_product_name", "name"),
+    # Per-store product lists (price updaters, product list sync)
+    Index("ix_product_store_id", "store", "id"),
+)
+
+price_table = Table(
+    "price",
+    metadata,
+    Column("report_id", String(16), primary_key=True),
+    Column("product_id", String(32), primary_key=True),
+    Column("price", Numeric(10, 2), nullable=False),
+    # "Prices in report X" reads the primary key, which InnoDB clusters
+    # with the row and so already covers price.
+    # Covering index for per-product history (filter on product_id, price)
+    Index("ix_price_product_report_price", "product_id", "report_id", "price"),
+)
+
+# Per-product daily rollup of valid (>= 0) prices; see db/rollup.py
+price_daily_table = Table(
+    "price_daily",
+    metadata,
+    Column("product_id", String(32), primary_key=True),
+    Column("day", Date, primary_key=True),
+    Column("price_sum", Numeric(14, 2), nullable=False),
+    Column("price_count", Integer, nullable=False),
+    Column("price_min", Numeric(10, 2), nullable=False),
+    Column("price_max", Numeric(10, 2), nullable=False),
+    # Covering index for date-range averages across all products
+    Index(
+        "ix_price_daily_day_product",
+        "day",
+        "product_id",
+        "price_sum",
+        "price_count",
+    ),
+)
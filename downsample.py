@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Chart downsampling
+# -----------------------------
+# Largest-Triangle-Three-Buckets (Steinarsson, 2013): keeps the first and
+# last points and, from each of `threshold - 2` equal buckets in between,
+# the point forming the largest triangle with the point kept from the
+# previous bucket and the average of the next one. Peaks and dips survive,
+# so a line drawn from the sample looks like one drawn from every point.
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Indices of the `threshold` points of (x, y) that LTTB keeps, in order.
+
+    `x` must be sorted. Series of at most `threshold` points (or a
+    threshold below 3) are returned whole.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    a = 0
+
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+
+        # Average of the next bucket (the last point, for the last bucket)
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(areas.argmax())
+        indices[i + 1] = a
+
+    indices[-1] = n - 1
+    return indices
+
+
+def downsample_series(df: pd.DataFrame, x: str, y: str, threshold: int) -> pd.DataFrame:
+    """
+    Rows of `df`, sorted by its date column `x`, that LTTB keeps to draw
+    `y` as a `threshold`-point line.
+    """
+    if len(df) <= threshold:
+        return df
+
+    xs = pd.to_datetime(df[x]).to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    keep = lttb_indices(xs, df[y].to_numpy(dtype=float), threshold)
+    return df.iloc[keep].reset_index(drop=True)
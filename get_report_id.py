@@ -1,35 +1,145 @@
 #!/usr/bin/env python3
 
+import logging
 from datetime import datetime
-from sqlalchemy import MetaData, Table, text
-from typing import Dict
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, Optional
 
+from db.tables import report_table
 
-def get_report_id(engine) -> Dict:
-    now = datetime.now()
+logger = logging.getLogger(__name__)
 
-    reportID = (
-        now.strftime("%d") + chr(int(now.strftime("%m")) + 64) + now.strftime("%y")
-    )
 
-    query = text(
-        f"SELECT id FROM report WHERE id LIKE '{reportID}%' ORDER BY timestamp DESC LIMIT 1"
-    )
+MAX_ALLOCATION_ATTEMPTS = 10
+
+
+def _report_suffix(n: int) -> str:
+    """1 -> "a", 26 -> "z", 27 -> "aa", ... (never overflows)."""
+    suffix = ""
+    while n > 0:
+        n, remainder = divmod(n - 1, 26)
+        suffix = chr(ord("a") + remainder) + suffix
+    return suffix
+
+
+def _suffix_number(suffix: str) -> int:
+    """Inverse of `_report_suffix`: "a" -> 1, "aa" -> 27, "" -> 0."""
+    n = 0
+    for char in suffix:
+        n = n * 26 + ord(char) - ord("a") + 1
+    return n
+
 
+def _last_suffix_number(connection, prefix: str) -> int:
+    """Number of the highest suffix already used under `prefix`, or 0."""
+    # Longer suffixes sort after shorter ones ("aa" follows "z")
+    last_id = connection.execute(
+        select(report_table.c.id)
+        .where(report_table.c.id.like(prefix + "%"))
+        .order_by(func.length(report_table.c.id).desc(), report_table.c.id.desc())
+        .limit(1)
+    ).scalar()
+
+    return _suffix_number(last_id[len(prefix) :]) if last_id else 0
+
+
+def _report_exists(engine, report_id: str) -> bool:
     with engine.begin() as connection:
-        result = connection.execute(query)
+        return (
+            connection.execute(
+                select(report_table.c.id).where(report_table.c.id == report_id)
+            ).first()
+            is not None
+        )
+
 
-    idList = [row.id for row in result]
-    reportID += chr(ord(idList[0][-1]) + 1) if idList else "a"
-    report_record = {
-        "id": reportID,
-        "timestamp": now.strftime(format="%Y-%m-%d %H:%M:%S"),
+def _report_record(row) -> Dict:
+    return {
+        "id": row.id,
+        "timestamp": row.timestamp.strftime(format="%Y-%m-%d %H:%M:%S"),
     }
 
+
+def join_report(engine, report_id: str) -> Dict:
+    """
+    Look up an already-open report so another worker can write into it.
+
+    Raises:
+        ValueError: if no report with that ID exists
+    """
+    with engine.begin() as connection:
+        row = connection.execute(
+            select(report_table.c.id, report_table.c.timestamp).where(
+                report_table.c.id == report_id
+            )
+        ).first()
+
+    if row is None:
+        raise ValueError(f"Report {report_id} does not exist")
+
+    return _report_record(row)
+
+
+def complete_report(engine, report_record: Dict) -> None:
+    """
+    Mark a report complete, making it visible to the readers.
+
+    Called once a run has written and rolled up all its prices. Every run
+    writing into the report sets it, so a joined report's completion time
+    is that of the last run to finish.
+    """
     with engine.begin() as connection:
         connection.execute(
-            Table("report", MetaData(), autoload_with=engine).insert(),
-            report_record,
+            report_table.update()
+            .where(report_table.c.id == report_record["id"])
+            .values(completed_at=datetime.now().replace(microsecond=0))
         )
 
-    return report_record
+
+def get_report_id(engine, report_id: Optional[str] = None) -> Dict:
+    """
+    Allocate a new report (or join `report_id` if given).
+
+    IDs are <day><month letter><year><suffix>, e.g. 16J26a, where the
+    suffix follows the highest one used that day. Each attempt is a single
+    INSERT; the primary key makes it atomic, so overlapping runs that pick
+    the same ID hit a duplicate key and move on to the next suffix instead
+    of sharing a report. Any other integrity error is raised.
+    """
+    if report_id is not None:
+        return join_report(engine, report_id)
+
+    now = datetime.now()
+
+    reportID = (
+        now.strftime("%d") + chr(int(now.strftime("%m")) + 64) + now.strftime("%y")
+    )
+
+    for _ in range(MAX_ALLOCATION_ATTEMPTS):
+        with engine.begin() as connection:
+            last = _last_suffix_number(connection, reportID)
+
+        report_record = {
+            "id": reportID + _report_suffix(last + 1),
+            "timestamp": now.strftime(format="%Y-%m-%d %H:%M:%S"),
+        }
+
+        try:
+            with engine.begin() as connection:
+                connection.execute(
+                    report_table.insert(),
+                    {**report_record, "timestamp": now.replace(microsecond=0)},
+                )
+        except IntegrityError:
+            # Only a duplicate ID (another run got there first) is retried;
+            # the check works the same on every backend
+            if not _report_exists(engine, report_record["id"]):
+                raise
+
+            logger.warning("Report ID %s already taken, retrying", report_record["id"])
+            continue
+
+        return report_record
+
+    raise RuntimeError(f"Could not allocate a report ID for {reportID}")
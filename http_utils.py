@@ -0,0 +1,79 @@
+import logging
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from selenium_utils import USER_AGENT
+
+logger = logging.getLogger(__name__)
+
+
+# Markers that show up on Amazon's robot-check / throttling pages
+BOT_WALL_MARKERS = (
+    "/errors/validateCaptcha",
+    "api-services-support@amazon.com",
+    "Robot Check",
+    "Enter the characters you see below",
+    "To discuss automated access to Amazon data",
+)
+
+
+# -----------------------------
+# Session factory
+# -----------------------------
+def create_http_session(*, pool_size: int = 4) -> requests.Session:
+    """
+    Create a keep-alive HTTP session for browserless page fetches.
+
+    Connections are pooled per host, so repeated product lookups reuse the
+    same TLS connection instead of handshaking every time.
+    """
+    session = requests.Session()
+
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    session.headers.update(
+        {
+            "User-Agent": USER_AGENT,
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "en-US,en;q=0.9",
+        }
+    )
+
+    return session
+
+
+# -----------------------------
+# Fetch helpers
+# -----------------------------
+def fetch_html(
+    session: requests.Session,
+    url: str,
+    *,
+    timeout: float = 10.0,
+) -> Optional[str]:
+    """
+    Fetch a page's initial HTML.
+
+    Returns:
+        str: page HTML, or None on any network error / non-200 response
+    """
+    try:
+        response = session.get(url, timeout=timeout)
+    except requests.RequestException as exc:
+        logger.warning("HTTP fetch failed for %s (%s)", url, exc.__class__.__name__)
+        return None
+
+    if response.status_code != 200:
+        logger.warning("HTTP fetch for %s returned %d", url, response.status_code)
+        return None
+
+    return response.text
+
+
+def is_bot_wall(html: str) -> bool:
+    """Return True if the page is a captcha / automated-access block."""
+    return any(marker in html for marker in BOT_WALL_MARKERS)
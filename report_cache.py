@@ -0,0 +1,249 @@
+import fcntl
+import json
+import logging
+import os
+import stat
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from dotenv import load_dotenv
+from sqlalchemy.engine import Engine
+
+from db import queries
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------------
+# Report-keyed result cache
+# -----------------------------
+# Dashboard data only changes when the tracker writes, so result frames
+# are cached on local disk under a key built from LATEST_REPORT_PROBE.
+# Every gunicorn worker on the host shares the same files: the first
+# worker to see a new key computes the frame (under a file lock, so the
+# others wait for it instead of repeating the queries) and the rest just
+# read it.
+#
+# Frames are stored as Arrow IPC files, which hold data only, so reading
+# a planted file cannot run code. The directory must also be private to
+# the dashboard's user (owned by it, no group / other access); it is
+# created that way and checked before every use.
+#
+# In front of the disk sits a per-process LRU bounded by memory size, so
+# callbacks that resolve a key on every click skip the read too.
+#
+# REPORT_CACHE_DIR overrides the cache directory.
+
+MEMORY_CACHE_BYTES = 64 * 1024 * 1024
+
+CACHE_FILE_SUFFIX = ".arrow"
+
+# Schema metadata key holding the frame's (JSON-serializable) attrs
+_ATTRS_KEY = b"report_cache.attrs"
+
+
+def cache_dir() -> Path:
+    load_dotenv()
+    return Path(
+        os.getenv("REPORT_CACHE_DIR")
+        or Path(os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache")
+        / "product_tracker"
+    )
+
+
+def _private_dir() -> Path:
+    """
+    The cache directory, created with mode 0700 if missing.
+
+    Raises:
+        RuntimeError: if it is not a directory owned by this user, or
+            other users can access it
+    """
+    directory = cache_dir()
+    directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+
+    info = directory.lstat()
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise RuntimeError(f"Report cache {directory} is not a directory we own")
+
+    if info.st_mode & 0o077:
+        raise RuntimeError(
+            f"Report cache {directory} is accessible to other users "
+            f"(mode {stat.S_IMODE(info.st_mode):o}); chmod 700 it"
+        )
+
+    return directory
+
+
+# -----------------------------
+# In-process LRU
+# -----------------------------
+def _size(value: Any) -> int:
+    """Approximate in-memory size, counting DataFrames column by column."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (tuple, list)):
+        return sum(_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class MemoryCache:
+    """
+    Thread-safe LRU that evicts least recently used entries once their
+    combined size exceeds `max_bytes`. An entry larger than `max_bytes` on
+    its own is not kept.
+    """
+
+    def __init__(self, max_bytes: int = MEMORY_CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, name: str, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get((name, key))
+            if entry is None:
+                return None
+
+            self._entries.move_to_end((name, key))
+            return entry[0]
+
+    def put(self, name: str, key: str, value: Any) -> None:
+        size = _size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop((name, key), None)
+            if old is not None:
+                self._bytes -= old[1]
+
+            self._entries[(name, key)] = (value, size)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+
+memory_cache = MemoryCache()
+
+
+# -----------------------------
+# Disk cache
+# -----------------------------
+def report_cache_key(engine: Engine, *parts) -> Optional[str]:
+    """
+    Key for the current database state, or None if there are no reports.
+
+    Extra `parts` (e.g. the averaging window start) are appended, for
+    results that also depend on them.
+    """
+    with engine.begin() as connection:
+        row = connection.execute(queries.LATEST_REPORT_PROBE).first()
+
+    if row is None:
+        return None
+
+    return "-".join(
+        str(part) for part in (row.id, row.price_count, row.rolled_up, *parts)
+    )
+
+
+def _cache_path(directory: Path, name: str, key: str) -> Path:
+    return directory / f"{name}-{key}{CACHE_FILE_SUFFIX}"
+
+
+def _read(path: Path) -> pd.DataFrame:
+    table = feather.read_table(path)
+    frame = table.to_pandas()
+
+    attrs = (table.schema.metadata or {}).get(_ATTRS_KEY)
+    if attrs is not None:
+        frame.attrs.update(json.loads(attrs))
+
+    return frame
+
+
+def _write(path: Path, frame: pd.DataFrame) -> None:
+    table = pa.Table.from_pandas(frame)
+    table = table.replace_schema_metadata(
+        {**(table.schema.metadata or {}), _ATTRS_KEY: json.dumps(frame.attrs)}
+    )
+
+    # Written under a temporary name and renamed into place, so readers
+    # never see a partial file
+    partial = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    feather.write_feather(table, partial)
+    os.replace(partial, path)
+
+
+def _remove_stale(directory: Path, name: str, keep: Path) -> None:
+    for path in directory.glob(f"{name}-*{CACHE_FILE_SUFFIX}"):
+        if path != keep:
+            path.unlink(missing_ok=True)
+
+
+def _read_disk(name: str, key: str) -> Optional[pd.DataFrame]:
+    try:
+        return _read(_cache_path(_private_dir(), name, key))
+    except FileNotFoundError:
+        return None
+
+
+def lookup(name: str, key: str) -> Optional[pd.DataFrame]:
+    """
+    Return the cached `name` result for `key` from memory or disk, or None
+    if it is not cached (e.g. the key belongs to an older report).
+    """
+    value = memory_cache.get(name, key)
+    if value is None:
+        value = _read_disk(name, key)
+        if value is not None:
+            memory_cache.put(name, key, value)
+
+    return value
+
+
+def cached(
+    name: str, key: Optional[str], compute: Callable[[], pd.DataFrame]
+) -> pd.DataFrame:
+    """
+    Return the cached `name` frame for `key`, computing it at most once
+    per key across all processes on this host.
+
+    Values in the frame's `attrs` must be JSON-serializable; they are
+    stored alongside it. A None key (nothing to key on) always computes.
+    """
+    if key is None:
+        return compute()
+
+    value = lookup(name, key)
+    if value is not None:
+        return value
+
+    directory = _private_dir()
+    path = _cache_path(directory, name, key)
+
+    with open(directory / f"{name}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        # Another worker may have filled it while we waited
+        value = _read_disk(name, key)
+
+        if value is None:
+            logger.info("Cache miss for %s (%s)", name, key)
+            value = compute()
+            _write(path, value)
+            _remove_stale(directory, name, path)
+
+    memory_cache.put(name, key, value)
+    return value
@@ -1,36 +1,88 @@
 #!/usr/bin/env python3
 
-from db.connection import get_mysql_engine
-from get_report_id import get_report_id
+import argparse
+import asyncio
+from functools import partial
+
+from db.connection import get_engine
+from db.migrations import migrate
+from db.rollup import update_price_rollup
+from get_report_id import complete_report, get_report_id
 from update_amazon_product_list import update_amazon_product_list
-from update_amazon_product_price import update_amazon_product_price
-from update_appletv_product_price import update_appletv_product_price
+from scrape_scheduler import run_scrape_jobs
+from update_amazon_product_price import update_amazon_product_price_async
+from update_appletv_product_price import update_appletv_product_price_async
 
 # from send_tracker_results import email_tracker_results
 
 import logging
 from logging_config import setup_logging
 
+PRICE_UPDATERS = {
+    "amazon": update_amazon_product_price_async,
+    "appletv": update_appletv_product_price_async,
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the product tracker.")
+    parser.add_argument(
+        "--report-id",
+        help="join an already-open report instead of allocating a new one "
+        "(skips the product list update, which the opening run owns)",
+    )
+    parser.add_argument(
+        "--store",
+        action="append",
+        choices=sorted(PRICE_UPDATERS),
+        help="only update prices for this store (repeatable; default: all)",
+    )
+    return parser.parse_args()
+
 
 def main():
+    args = parse_args()
+
     setup_logging()
     logger = logging.getLogger(__name__)
 
-    engine = get_mysql_engine()
+    engine = get_engine(profile="scraper-writer")
 
     logger.info("Product Tracker start")
 
-    logger.info("Updating Amazon product list...")
-    update_amazon_product_list(engine)
+    logger.info("Applying schema migrations...")
+    migrate(engine)
 
-    logger.info("Getting report ID...")
-    report_record = get_report_id(engine)
-
-    logger.info("Updating Amazon product prices...")
-    update_amazon_product_price(engine, report_record)
+    if args.report_id is None:
+        logger.info("Updating Amazon product list...")
+        update_amazon_product_list(engine)
 
-    logger.info("Updating Apple TV product prices...")
-    update_appletv_product_price(engine, report_record)
+    logger.info("Getting report ID...")
+    report_record = get_report_id(engine, args.report_id)
+    logger.info("Writing to report %s", report_record["id"])
+
+    # Each store once, in the order given
+    stores = list(dict.fromkeys(args.store or PRICE_UPDATERS))
+
+    logger.info("Updating product prices for %s...", ", ".join(stores))
+    stats = asyncio.run(
+        run_scrape_jobs(
+            *(partial(PRICE_UPDATERS[store], engine, report_record) for store in stores)
+        )
+    )
+
+    for store, store_stats in zip(stores, stats):
+        if isinstance(store_stats, Exception):
+            logger.error("%s prices failed: %s", store, store_stats)
+        else:
+            logger.info("%s prices: %s", store, store_stats or "no products")
+
+    logger.info("Updating daily price rollup...")
+    update_price_rollup(engine, report_record)
+
+    # Readers skip the report until now, so they never show a partial one
+    complete_report(engine, report_record)
+    logger.info("Report %s complete", report_record["id"])
 
     # logger.info("Sending tracker results...")
     # email_tracker_results(engine)
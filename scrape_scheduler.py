@@ -0,0 +1,338 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from selenium.common.exceptions import WebDriverException
+
+from selenium_utils import DriverPool
+
+logger = logging.getLogger(__name__)
+
+
+MAX_WORKERS = 2
+DRIVER_MAX_PAGES = 50
+
+T = TypeVar("T")
+
+
+class TransientScrapeError(Exception):
+    """Raised by a fetch function when the attempt should be retried."""
+
+
+@dataclass
+class RetryStats:
+    total: int = 0
+    deferred: int = 0  # failed on the first pass
+    recovered: int = 0  # succeeded on a deferred retry
+    failed: int = 0  # still failing after every retry
+
+    def __str__(self) -> str:
+        return (
+            f"{self.total} total, {self.deferred} deferred, "
+            f"{self.recovered} recovered on retry, {self.failed} failed"
+        )
+
+
+# -----------------------------
+# Per-host politeness limits
+# -----------------------------
+@dataclass(frozen=True)
+class HostLimit:
+    rate: float  # requests per second, long-run average
+    burst: int = 1  # requests allowed back-to-back
+    concurrency: int = 2  # page loads in flight at once
+
+
+DEFAULT_HOST_LIMIT = HostLimit(rate=0.5, burst=1, concurrency=1)
+
+# Keyed by host without a leading "www."
+HOST_LIMITS: Dict[str, HostLimit] = {
+    "amazon.com": HostLimit(rate=0.5, burst=2, concurrency=2),
+    "cheapcharts.com": HostLimit(rate=0.5, burst=2, concurrency=2),
+}
+
+
+def host_key(host: str) -> str:
+    """Normalize a host so www.example.com and example.com share limits."""
+    host = host.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class TokenBucket:
+    """
+    Async token bucket.
+
+    `acquire()` waits (without blocking the event loop) until a token is
+    available, so one host's pacing never stalls work on another host.
+    """
+
+    def __init__(self, rate: float, capacity: int = 1) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        if self._updated is not None:
+            elapsed = now - self._updated
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        async with self._lock:
+            while True:
+                self._refill(loop.time())
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# -----------------------------
+# Scheduler
+# -----------------------------
+ResultCallback = Callable[[Any, Any], Awaitable[None]]
+
+
+class ScrapeScheduler:
+    """
+    Run blocking fetch functions under per-host pacing.
+
+    Each host gets its own token bucket and concurrency cap, and no more
+    than `max_workers` fetches run at once overall (match this to the
+    driver pool size so threads never queue on a lease). Fetches run in
+    worker threads; retries are scheduled on the event loop, so a backoff
+    for one product leaves every other product free to proceed.
+
+        scheduler = ScrapeScheduler()
+        prices, stats = await scheduler.map("amazon.com", fetch, urls, default=-1.0)
+    """
+
+    def __init__(
+        self,
+        host_limits: Optional[Dict[str, HostLimit]] = None,
+        *,
+        max_workers: int = MAX_WORKERS,
+        max_retries: int = 3,
+        retry_delay: float = 5.0,
+    ) -> None:
+        self.host_limits = HOST_LIMITS if host_limits is None else host_limits
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self._workers = asyncio.Semaphore(max_workers)
+
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _limit(self, host: str) -> HostLimit:
+        return self.host_limits.get(host_key(host), DEFAULT_HOST_LIMIT)
+
+    def _bucket(self, host: str) -> TokenBucket:
+        key = host_key(host)
+        if key not in self._buckets:
+            limit = self._limit(host)
+            self._buckets[key] = TokenBucket(limit.rate, limit.burst)
+        return self._buckets[key]
+
+    def _semaphore(self, host: str) -> asyncio.Semaphore:
+        key = host_key(host)
+        if key not in self._semaphores:
+            self._semaphores[key] = asyncio.Semaphore(self._limit(host).concurrency)
+        return self._semaphores[key]
+
+    async def attempt(self, host: str, fn: Callable[..., T], *args: Any) -> T:
+        """
+        Run `fn(*args)` once, in a thread, when `host` allows another request.
+
+        Raises:
+            TransientScrapeError: if the attempt failed and may be retried
+        """
+        await self._bucket(host).acquire()
+
+        async with self._semaphore(host), self._workers:
+            return await asyncio.to_thread(fn, *args)
+
+    async def run(self, host: str, fn: Callable[..., T], *args: Any) -> T:
+        """
+        Like `attempt`, but retry inline with exponential backoff.
+
+        Raises:
+            TransientScrapeError: after `max_retries` failed attempts
+        """
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                return await self.attempt(host, fn, *args)
+
+            except TransientScrapeError as exc:
+                if attempt == self.max_retries:
+                    logger.error("Max retries exceeded on %s (%s)", host, exc)
+                    raise
+
+                delay = self.retry_delay * 2 ** (attempt - 1)
+                logger.warning(
+                    "Transient failure on %s (attempt %d/%d), retrying in %.1fs",
+                    host,
+                    attempt,
+                    self.max_retries,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+
+    async def map_deferred(
+        self,
+        job: Callable[[Any], Awaitable[T]],
+        items: Sequence[Any],
+        *,
+        default: T,
+        label: str = "items",
+        on_result: Optional[ResultCallback] = None,
+    ) -> Tuple[List[T], RetryStats]:
+        """
+        Run async `job` over `items`, deferring transient failures.
+
+        The first pass runs every item once. Items whose job raised
+        TransientScrapeError (or a WebDriverException) go to a retry queue
+        that is only worked after the first pass, in rounds with
+        exponential backoff, so one slow item never holds up the rest.
+        Items still failing after `max_retries` attempts yield `default`.
+        Any other error is raised once the rest of its round has finished.
+
+        If given, `await on_result(item, result)` runs as soon as each
+        item's final result is known (e.g. to stream it to the database).
+
+        Returns:
+            (results in input order, retry statistics)
+        """
+        results: List[T] = [default] * len(items)
+
+        async def run_one(index: int) -> bool:
+            try:
+                results[index] = await job(items[index])
+            except (TransientScrapeError, WebDriverException) as exc:
+                if isinstance(exc, WebDriverException):
+                    logger.warning("Browser error on %s: %s", items[index], exc.msg)
+                return False
+
+            if on_result is not None:
+                await on_result(items[index], results[index])
+            return True
+
+        async def run_round(indexes: List[int]) -> List[int]:
+            # Every item in the round finishes before any other error is
+            # raised, so no fetch is left running against a closed pool
+            outcomes = await asyncio.gather(
+                *(run_one(i) for i in indexes), return_exceptions=True
+            )
+            for outcome in outcomes:
+                if isinstance(outcome, BaseException):
+                    raise outcome
+
+            return [i for i, ok in zip(indexes, outcomes) if not ok]
+
+        pending = await run_round(list(range(len(items))))
+        stats = RetryStats(total=len(items), deferred=len(pending))
+
+        for retry in range(1, self.max_retries):
+            if not pending:
+                break
+
+            delay = self.retry_delay * 2 ** (retry - 1)
+            logger.info(
+                "Retrying %d deferred %s in %.1fs (round %d/%d)",
+                len(pending),
+                label,
+                delay,
+                retry,
+                self.max_retries - 1,
+            )
+            await asyncio.sleep(delay)
+
+            pending = await run_round(pending)
+
+        stats.failed = len(pending)
+        stats.recovered = stats.deferred - stats.failed
+
+        if pending:
+            logger.error("Giving up on %d %s after retries", len(pending), label)
+
+            if on_result is not None:
+                for index in pending:
+                    await on_result(items[index], default)
+
+        return results, stats
+
+    async def map(
+        self,
+        host: str,
+        fn: Callable[[Any], T],
+        items: Sequence[Any],
+        *,
+        default: T,
+        on_result: Optional[ResultCallback] = None,
+    ) -> Tuple[List[T], RetryStats]:
+        """
+        Run `fn` over `items` on `host` (see `map_deferred`).
+        """
+
+        async def job(item: Any) -> T:
+            return await self.attempt(host, fn, item)
+
+        return await self.map_deferred(
+            job,
+            items,
+            default=default,
+            label=f"items on {host}",
+            on_result=on_result,
+        )
+
+
+# -----------------------------
+# Entry point
+# -----------------------------
+ScrapeJob = Callable[[ScrapeScheduler, DriverPool], Awaitable[Any]]
+
+
+async def run_scrape_jobs(
+    *jobs: ScrapeJob,
+    workers: int = MAX_WORKERS,
+    max_pages: int = DRIVER_MAX_PAGES,
+) -> List[Any]:
+    """
+    Run scrape jobs side by side over one driver pool and one scheduler.
+
+    Each job is an async callable taking `(scheduler, pool)`, e.g. a price
+    updater with its engine and report already bound via functools.partial.
+    A job that raises is logged and does not stop the others.
+
+    Returns:
+        list: each job's return value (or the exception it raised), in
+            argument order
+    """
+    with DriverPool(workers, max_pages=max_pages, scrape_profile=True) as pool:
+        scheduler = ScrapeScheduler(max_workers=workers)
+        results = await asyncio.gather(
+            *(job(scheduler, pool) for job in jobs), return_exceptions=True
+        )
+
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error("Scrape job failed", exc_info=result)
+
+    return list(results)
@@ -1,7 +1,10 @@
 import logging
+import queue
 import random
-from time import sleep
-from typing import Tuple
+import threading
+from contextlib import contextmanager
+from time import monotonic, sleep
+from typing import Iterator, List, Optional, Tuple
 
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
@@ -13,10 +16,49 @@ from selenium.common.exceptions import TimeoutException, WebDriverException
 logger = logging.getLogger(__name__)
 
 
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+
+
+# Requests dropped by the scrape profile: heavy static assets plus ad /
+# analytics / telemetry endpoints. We only read a few text nodes per page.
+SCRAPE_BLOCKED_URLS = [
+    # Images / media / fonts
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.webp",
+    "*.svg",
+    "*.ico",
+    "*.mp4",
+    "*.webm",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    # Third-party / tracking domains
+    "*amazon-adsystem.com*",
+    "*fls-na.amazon.com*",
+    "*unagi.amazon.com*",
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*googletagmanager.com*",
+    "*google-analytics.com*",
+    "*facebook.net*",
+]
+
+
 # -----------------------------
 # Chrome configuration
 # -----------------------------
-def _build_chrome_options(headless: bool = True) -> Options:
+def _build_chrome_options(
+    headless: bool = True,
+    scrape_profile: bool = False,
+) -> Options:
     options = Options()
 
     if headless:
@@ -39,29 +81,63 @@ def _build_chrome_options(headless: bool = True) -> Options:
     options.add_argument("--lang=en-US")
 
     # Reduce bot fingerprinting
-    options.add_argument(
-        "--user-agent=Mozilla/5.0 (X11; Linux x86_64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/120.0.0.0 Safari/537.36"
-    )
+    options.add_argument(f"--user-agent={USER_AGENT}")
+
+    if scrape_profile:
+        # Return from driver.get() at DOMContentLoaded; waits handle the rest
+        options.page_load_strategy = "eager"
+
+        options.add_experimental_option(
+            "prefs",
+            {
+                "profile.managed_default_content_settings.images": 2,
+                "profile.managed_default_content_settings.media_stream": 2,
+                "profile.managed_default_content_settings.notifications": 2,
+                "profile.managed_default_content_settings.plugins": 2,
+                "profile.managed_default_content_settings.popups": 2,
+            },
+        )
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_argument("--autoplay-policy=user-gesture-required")
 
     return options
 
 
+def _block_urls(driver: webdriver.Chrome, patterns: List[str]) -> None:
+    """Drop matching requests at the network layer via DevTools."""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    except WebDriverException:
+        logger.warning("DevTools URL blocking unavailable, continuing without it")
+
+
 # -----------------------------
 # WebDriver factory
 # -----------------------------
-def create_webdriver(*, headless: bool = True, timeout: int = 30) -> webdriver.Chrome:
+def create_webdriver(
+    *,
+    headless: bool = True,
+    timeout: int = 30,
+    scrape_profile: bool = False,
+) -> webdriver.Chrome:
     """
     Create a hardened Chrome WebDriver + WebDriverWait.
 
+    With `scrape_profile`, the driver uses the "eager" page-load strategy
+    and skips images, media, fonts and SCRAPE_BLOCKED_URLS. Use it for
+    pages we only read text from.
+
     Always use this factory. Never instantiate drivers directly.
     """
-    options = _build_chrome_options(headless=headless)
+    options = _build_chrome_options(headless=headless, scrape_profile=scrape_profile)
 
     driver = webdriver.Chrome(options=options)
     driver.set_page_load_timeout(timeout)
 
+    if scrape_profile:
+        _block_urls(driver, SCRAPE_BLOCKED_URLS)
+
     return driver
 
 
@@ -73,6 +149,171 @@ def create_wait(
     return WebDriverWait(driver, timeout)
 
 
+# -----------------------------
+# Driver pool
+# -----------------------------
+class _PooledDriver:
+    """A pooled Chrome session plus the number of pages it has served."""
+
+    def __init__(self, driver: webdriver.Chrome) -> None:
+        self.driver = driver
+        self.pages = 0
+
+
+class DriverPool:
+    """
+    Bounded pool of warm Chrome sessions.
+
+    Sessions are started lazily, up to `size`, so a run that never needs a
+    browser never pays for one. Workers lease a driver, use it for one
+    page, and return it. On checkout
+    each driver is health-checked; on return its cookies and storage are
+    cleared. Drivers are recycled after `max_pages` pages so long runs do
+    not accumulate Chrome memory.
+
+        with DriverPool(size=2) as pool:
+            with pool.lease() as driver:
+                safe_get(driver, url)
+    """
+
+    def __init__(
+        self,
+        size: int = 1,
+        *,
+        max_pages: int = 50,
+        headless: bool = True,
+        timeout: int = 30,
+        scrape_profile: bool = False,
+    ) -> None:
+        self.size = size
+        self.max_pages = max_pages
+        self.headless = headless
+        self.timeout = timeout
+        self.scrape_profile = scrape_profile
+
+        self._idle: "queue.Queue[_PooledDriver]" = queue.Queue()
+        self._all: List[_PooledDriver] = []
+        self._lock = threading.Lock()
+        self._starting = 0
+        self._closed = False
+
+    def _spawn(self) -> _PooledDriver:
+        pooled = _PooledDriver(
+            create_webdriver(
+                headless=self.headless,
+                timeout=self.timeout,
+                scrape_profile=self.scrape_profile,
+            )
+        )
+        with self._lock:
+            self._all.append(pooled)
+        return pooled
+
+    def _discard(self, pooled: _PooledDriver) -> None:
+        with self._lock:
+            if pooled in self._all:
+                self._all.remove(pooled)
+        try:
+            pooled.driver.quit()
+        except WebDriverException:
+            logger.warning("Failed to quit pooled driver cleanly")
+
+    @staticmethod
+    def _is_healthy(pooled: _PooledDriver) -> bool:
+        try:
+            return pooled.driver.execute_script("return 1") == 1
+        except WebDriverException:
+            return False
+
+    @staticmethod
+    def _reset(pooled: _PooledDriver) -> None:
+        """Clear cookies and web storage so leases do not leak state."""
+        driver = pooled.driver
+        try:
+            driver.execute_script(
+                "try { window.localStorage.clear(); } catch (e) {}"
+                "try { window.sessionStorage.clear(); } catch (e) {}"
+            )
+        except WebDriverException:
+            pass
+        driver.delete_all_cookies()
+        driver.get("about:blank")
+
+    def _checkout(self, timeout: Optional[float]) -> _PooledDriver:
+        try:
+            pooled = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_spawn = len(self._all) + self._starting < self.size
+                if can_spawn:
+                    self._starting += 1
+
+            if can_spawn:
+                try:
+                    return self._spawn()
+                finally:
+                    with self._lock:
+                        self._starting -= 1
+
+            pooled = self._idle.get(timeout=timeout)
+
+        if pooled.pages >= self.max_pages:
+            logger.info("Recycling driver after %d pages", pooled.pages)
+            self._discard(pooled)
+            return self._spawn()
+
+        if not self._is_healthy(pooled):
+            logger.warning("Pooled driver failed health check, replacing it")
+            self._discard(pooled)
+            return self._spawn()
+
+        return pooled
+
+    def _checkin(self, pooled: _PooledDriver) -> None:
+        pooled.pages += 1
+
+        if self._closed:
+            self._discard(pooled)
+            return
+
+        try:
+            self._reset(pooled)
+        except WebDriverException:
+            logger.warning("Failed to reset pooled driver, replacing it")
+            self._discard(pooled)
+            pooled = self._spawn()
+
+        self._idle.put(pooled)
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None) -> Iterator[webdriver.Chrome]:
+        """Borrow a driver for the duration of the `with` block."""
+        if self._closed:
+            raise RuntimeError("DriverPool is closed")
+
+        pooled = self._checkout(timeout)
+        try:
+            yield pooled.driver
+        finally:
+            self._checkin(pooled)
+
+    def close(self) -> None:
+        """Quit every driver owned by the pool."""
+        self._closed = True
+
+        with self._lock:
+            drivers = list(self._all)
+
+        for pooled in drivers:
+            self._discard(pooled)
+
+    def __enter__(self) -> "DriverPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
 # -----------------------------
 # Navigation helpers
 # -----------------------------
@@ -108,69 +349,111 @@ def safe_get(
 # -----------------------------
 # Scrolling / lazy-load helpers
 # -----------------------------
-def scroll_to_bottom(
+# Scrolls to the bottom, then resolves on the first DOM mutation under the
+# container (more content arrived) or after `idleMs` with none (loading
+# stopped). Returns the current item count and whether the end marker is
+# present.
+_LAZY_LOAD_SCRIPT = """
+const [containerSelector, itemSelector, endSelector, idleMs, done] = arguments;
+
+const state = (changed) => ({
+    count: document.querySelectorAll(itemSelector).length,
+    ended: endSelector ? document.querySelector(endSelector) !== null : false,
+    changed: changed,
+});
+
+window.scrollTo(0, document.body.scrollHeight);
+
+const initial = state(false);
+if (initial.ended) {
+    done(initial);
+    return;
+}
+
+const target = document.querySelector(containerSelector) || document.body;
+let timer = null;
+
+const observer = new MutationObserver(() => {
+    clearTimeout(timer);
+    observer.disconnect();
+    done(state(true));
+});
+observer.observe(target, { childList: true, subtree: true });
+
+timer = setTimeout(() => {
+    observer.disconnect();
+    done(state(false));
+}, idleMs);
+"""
+
+
+def wait_for_lazy_load(
     driver: webdriver.Chrome,
     *,
-    pause: float = 0.5,
-    max_attempts: int = 10,
-) -> None:
-    """
-    Force lazy-loaded content to render (critical in headless mode).
+    container_selector: str,
+    item_selector: str,
+    end_marker_selector: Optional[str] = None,
+    idle_seconds: float = 1.0,
+    timeout: float = 30.0,
+) -> int:
     """
-    last_height = driver.execute_script("return document.body.scrollHeight")
+    Scroll until lazy-loaded content stops arriving.
 
-    for _ in range(max_attempts):
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        sleep(pause)
+    A MutationObserver injected into the page reports as soon as new
+    content lands, so there are no fixed pauses. Returns once the end
+    marker appears, once `idle_seconds` pass with no mutations, or when
+    `timeout` is reached, whichever comes first.
 
-        new_height = driver.execute_script("return document.body.scrollHeight")
-        if new_height == last_height:
-            break
-        last_height = new_height
-
-
-# -----------------------------
-# Amazon-specific waits
-# -----------------------------
-# def wait_for_amazon_list_items(
-#     driver: webdriver.Chrome,
-#     wait: WebDriverWait,
-#     *,
-#     min_items: int = 5,
-# ) -> None:
-#     """
-#     Wait until Amazon wishlist items are *actually rendered*.
+    Returns:
+        int: number of items matching `item_selector`
+    """
+    deadline = monotonic() + timeout
+    driver.set_script_timeout(idle_seconds + 5)
 
-#     presence_of_element_located is NOT sufficient on Linux headless.
-#     """
-#     logger.info("Waiting for Amazon wishlist container")
+    count = 0
 
-#     wait.until(EC.visibility_of_element_located((By.ID, "g-items")))
+    while True:
+        remaining = deadline - monotonic()
+        if remaining <= 0:
+            logger.warning("Lazy-load deadline reached with %d items", count)
+            return count
 
-#     logger.info("Waiting for wishlist items to populate")
+        state = driver.execute_async_script(
+            _LAZY_LOAD_SCRIPT,
+            container_selector,
+            item_selector,
+            end_marker_selector,
+            int(min(idle_seconds, remaining) * 1000),
+        )
+        count = state["count"]
 
-#     wait.until(
-#         lambda d: len(d.find_elements(By.CSS_SELECTOR, "#g-items li")) >= min_items
-#     )
+        if state["ended"] or not state["changed"]:
+            return count
 
 
+# -----------------------------
+# Amazon-specific waits
+# -----------------------------
 def wait_for_amazon_list_items(
-    driver, pause_seconds: float = 1.5, max_attempts: int = 20
-):
-    """
-    Scroll down until no new content loads.
+    driver: webdriver.Chrome,
+    *,
+    idle_seconds: float = 1.5,
+    timeout: float = 60.0,
+) -> int:
     """
-    last_height = 0
+    Wait until every Amazon wishlist item has been lazy-loaded.
 
-    for _ in range(max_attempts):
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        sleep(pause_seconds)
-
-        new_height = driver.execute_script("return document.body.scrollHeight")
-        if new_height == last_height:
-            return
-
-        last_height = new_height
+    Returns:
+        int: number of rendered `#g-items li` items
+    """
+    return wait_for_lazy_load(
+        driver,
+        container_selector="#g-items",
+        item_selector="#g-items li",
+        end_marker_selector="#endOfListMarker",
+        idle_seconds=idle_seconds,
+        timeout=timeout,
+    )
 
 
 # -----------------------------
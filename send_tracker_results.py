@@ -9,9 +9,12 @@ from decimal import Decimal, ROUND_HALF_UP
 from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
 
-from sqlalchemy import MetaData, Table, text
+from sqlalchemy import MetaData, Table
 from sqlalchemy.engine import Engine
 
+from db import queries
+from db.rollup import average_window_start
+
 import sendgrid
 from sendgrid.helpers.mail import Mail
 
@@ -27,11 +30,7 @@ def get_current_report_id(engine: Engine) -> Dict:
     Fetch current report ID.
     """
     with engine.begin() as connection:
-        result = connection.execute(
-            text(
-                "SELECT id, timestamp FROM product_tracker.report ORDER BY timestamp DESC LIMIT 1"
-            )
-        )
+        result = connection.execute(queries.CURRENT_REPORT).all()
 
     keys = ("id", "timestamp")
     report_id = [dict(zip(keys, report_id)) for report_id in [row for row in result]][0]
@@ -45,12 +44,8 @@ def get_current_product_prices(engine: Engine, report_id: str) -> Dict:
     """
     with engine.begin() as connection:
         result = connection.execute(
-            text(
-                "SELECT name, price, product.id AS id, store FROM price JOIN product ON price.product_id = product.id WHERE report_id = '{}' AND price > 0 ORDER BY price ASC".format(
-                    report_id
-                )
-            )
-        )
+            queries.EMAIL_PRICES, {"report_id": report_id}
+        ).all()
 
     keys = ("name", "price", "id", "store")
     product_prices = [dict(zip(keys, product)) for product in [row for row in result]]
@@ -61,13 +56,14 @@ def get_current_product_prices(engine: Engine, report_id: str) -> Dict:
 def get_average_product_prices(engine: Engine) -> List:
     """
     Fetch averaget prices for all products.
+
+    3-month averages come from the price_daily rollup, with the latest
+    report's own price backed out so it is compared against history only.
     """
     with engine.begin() as connection:
         result = connection.execute(
-            text(
-                "SELECT product_id AS id, ROUND(AVG(price), 2) AS average_price FROM price WHERE report_id IN (SELECT id FROM report WHERE timestamp >= NOW() - INTERVAL 3 MONTH AND timestamp != (SELECT MAX(timestamp) FROM report)) GROUP BY product_id"
-            )
-        )
+            queries.EMAIL_AVERAGE_PRICES, {"since": average_window_start()}
+        ).all()
 
     keys = ("id", "average_price")
     product_prices = [dict(zip(keys, product)) for product in [row for row in result]]
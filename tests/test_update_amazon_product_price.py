@@ -0,0 +1,83 @@
+import time
+from urllib.parse import quote
+
+import pytest
+
+from selenium.common.exceptions import WebDriverException
+
+from selenium_utils import create_wait, create_webdriver
+from update_amazon_product_price import PRICE_MAX_WAIT_MS, _extract_price_from_page
+
+BOX = """
+<div class="a-box-group">
+  <span class="a-price-whole">24.</span><span class="a-price-fraction">99</span>
+</div>
+"""
+
+# A book page: the price box renders first and the format toggles are
+# added to their container `toggle_delay` ms later, as happens with the
+# eager page-load strategy
+BOOK_PAGE = BOX + """
+<div id="formats"></div>
+<script>
+  setTimeout(() => {
+    document.getElementById("formats").innerHTML = `
+      <span class="a-button a-spacing-none a-button-toggle format">
+        <span class="slot-title">Kindle</span>
+        <span class="slot-price">$9.99</span>
+      </span>
+      <span class="a-button a-spacing-none a-button-toggle format">
+        <span class="slot-title">Paperback</span>
+        <span class="slot-price">$14.50</span>
+      </span>`;
+  }, %d);
+</script>
+"""
+
+# A non-book page whose deal countdown rewrites itself every 200 ms
+TICKING_PAGE = BOX + """
+<div id="countdown">0</div>
+<script>
+  setInterval(() => {
+    const el = document.getElementById("countdown");
+    el.textContent = String(Number(el.textContent) + 1);
+  }, 200);
+</script>
+"""
+
+
+@pytest.fixture(scope="module")
+def driver():
+    try:
+        driver = create_webdriver(scrape_profile=True)
+    except WebDriverException as exc:
+        pytest.skip(f"Chrome is not available: {exc.msg}")
+
+    yield driver
+    driver.quit()
+
+
+def _price_for(driver, body: str) -> float:
+    driver.get(
+        "data:text/html;charset=utf-8," + quote(f"<html><body>{body}</body></html>")
+    )
+    return _extract_price_from_page(create_wait(driver, timeout=10))
+
+
+def test_toggles_arriving_after_boxes_win(driver):
+    assert _price_for(driver, BOOK_PAGE % 400) == 9.99
+
+
+def test_toggles_arriving_after_settle_window_win(driver):
+    assert _price_for(driver, BOOK_PAGE % 1500) == 9.99
+
+
+def test_boxes_only_page_reads_box_price(driver):
+    assert _price_for(driver, BOX) == 24.99
+
+
+def test_boxes_only_page_with_ticking_dom_reads_box_price(driver):
+    started = time.monotonic()
+
+    assert _price_for(driver, TICKING_PAGE) == 24.99
+    assert time.monotonic() - started < PRICE_MAX_WAIT_MS / 1000
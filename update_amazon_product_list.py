@@ -1,24 +1,21 @@
 #!/usr/bin/env python3
 
+import asyncio
 import logging
-import re
-from time import sleep
-from typing import Dict, List
-
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-
-from selenium_utils import (
-    create_webdriver,
-    create_wait,
-    safe_get,
-    scroll_to_bottom,
-    wait_for_amazon_list_items,
-)
-
-from sqlalchemy import MetaData, Table, text
+from functools import partial
+from time import monotonic
+from typing import Dict, List, Tuple
+from urllib.parse import urlparse
+
+from scrape_scheduler import MAX_WORKERS, ScrapeScheduler, run_scrape_jobs
+from selenium_utils import DriverPool, safe_get, wait_for_amazon_list_items
+
+from sqlalchemy import select
 from sqlalchemy.engine import Engine
 
+from db.dialects import upsert
+from db.tables import product_table
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,50 +25,53 @@ AMAZON_WISHLIST_URLS = [
 ]
 
 
-def scroll_until_complete(driver, pause_seconds: float = 1.5, max_attempts: int = 20):
-    """
-    Scroll down until no new content loads.
-    """
-    last_height = 0
+# Reads every wishlist item in one round-trip. The product ID is the 5th
+# path segment of the first product link; a leading "Best Seller" badge
+# line is skipped when picking the name.
+_WISHLIST_ITEMS_SCRIPT = """
+const container = document.getElementById("g-items");
+if (!container) {
+    return [];
+}
 
-    for _ in range(max_attempts):
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        sleep(pause_seconds)
+return Array.from(container.querySelectorAll("li")).flatMap((item) => {
+    const link = item.querySelector(".a-link-normal");
+    if (!link) {
+        return [];
+    }
 
-        new_height = driver.execute_script("return document.body.scrollHeight")
-        if new_height == last_height:
-            return
+    const lines = item.innerText
+        .split("\\n")
+        .map((line) => line.trim())
+        .filter((line) => line);
+    const nameIndex = lines.length && /Best Seller/.test(lines[0]) ? 1 : 0;
 
-        last_height = new_height
+    return [{
+        id: (link.href || "").split("/")[4] || null,
+        name: lines[nameIndex] || null,
+    }];
+});
+"""
 
 
 def _extract_products_from_page(driver) -> List[Dict[str, str]]:
-    """Extract product records from the current wishlist page."""
-    wait_for_amazon_list_items(driver)
-
-    items_container = driver.find_element(By.ID, "g-items")
+    """Extract product records from the current (fully loaded) wishlist page."""
+    items = driver.execute_script(_WISHLIST_ITEMS_SCRIPT) or []
 
     products: List[Dict[str, str]] = []
 
-    for item in items_container.find_elements(By.CSS_SELECTOR, "li"):
-        links = item.find_elements(By.CLASS_NAME, "a-link-normal")
-        if not links:
-            continue
-
-        text_lines = item.text.split("\n")
+    for item in items:
+        product_id = item.get("id")
+        name = item.get("name")
 
-        try:
-            product_id = links[0].get_attribute("href").split("/")[4]
-        except (IndexError, AttributeError):
-            logger.warning("Failed to parse product ID, skipping item")
+        if not product_id or not name:
+            logger.warning("Failed to parse wishlist item, skipping item")
             continue
 
-        name_index = 1 if re.search("Best Seller", text_lines[0]) else 0
-
         products.append(
             {
                 "id": product_id,
-                "name": text_lines[name_index],
+                "name": name,
                 "store": "Amazon",
             }
         )
@@ -79,36 +79,134 @@ def _extract_products_from_page(driver) -> List[Dict[str, str]]:
     return products
 
 
-def update_amazon_product_list(engine: Engine) -> None:
-    """
-    Refresh the Amazon product list in the database.
+def _crawl_wishlist(url: str, pool: DriverPool) -> List[Dict[str, str]]:
+    """Load one wishlist on a pooled driver and extract its products."""
+    logger.info("Loading wishlist URL: %s", url)
+    started = monotonic()
+
+    with pool.lease() as driver:
+        safe_get(driver, url)
+
+        # Force lazy-loaded items to render
+        wait_for_amazon_list_items(driver)
+
+        products = _extract_products_from_page(driver)
+
+    logger.info(
+        "Extracted %d products from %s in %.1fs",
+        len(products),
+        url,
+        monotonic() - started,
+    )
+
+    return products
+
+
+def _dedupe_products(product_lists: List[List[Dict[str, str]]]) -> List[Dict[str, str]]:
+    """Merge per-wishlist results, keeping the first record for each ID."""
+    products: Dict[str, Dict[str, str]] = {}
+
+    for product in (p for product_list in product_lists for p in product_list):
+        products.setdefault(product["id"], product)
+
+    return list(products.values())
+
+
+def sync_products(
+    engine: Engine, store: str, products: List[Dict[str, str]]
+) -> Tuple[int, int, int]:
     """
-    logger.info("Starting Amazon product list update")
+    Make the store's rows in `product` match `products`.
 
-    all_products: List[Dict[str, str]] = []
+    Only the difference is written: new and renamed products go through a
+    single upsert (see db/dialects.py), and products no longer listed are
+    deleted. Unchanged rows are not touched.
 
-    for url in AMAZON_WISHLIST_URLS:
-        logger.info("Loading wishlist URL: %s", url)
+    Returns:
+        (added, renamed, removed) counts
+    """
+    with engine.begin() as connection:
+        existing = {
+            row.id: row.name
+            for row in connection.execute(
+                select(product_table.c.id, product_table.c.name).where(
+                    product_table.c.store == store
+                )
+            )
+        }
+
+        wanted = {product["id"]: product for product in products}
+
+        added = [p for pid, p in wanted.items() if pid not in existing]
+        renamed = [
+            p
+            for pid, p in wanted.items()
+            if pid in existing and existing[pid] != p["name"]
+        ]
+        removed = [pid for pid in existing if pid not in wanted]
+
+        upsert(connection, product_table, added + renamed, ["name", "store"])
+
+        if removed:
+            connection.execute(
+                product_table.delete().where(
+                    product_table.c.store == store,
+                    product_table.c.id.in_(removed),
+                )
+            )
+
+    return len(added), len(renamed), len(removed)
+
+
+async def update_amazon_product_list_async(
+    engine: Engine,
+    scheduler: ScrapeScheduler,
+    pool: DriverPool,
+) -> None:
+    """
+    Refresh the Amazon product list in the database.
 
-        with create_webdriver() as driver:
-            safe_get(driver, url)
+    Wishlists are crawled in parallel on the shared driver pool, under the
+    scheduler's Amazon pacing.
+    """
+    logger.info("Starting Amazon product list update")
 
-            # Force lazy-loaded items to render
-            scroll_to_bottom(driver)
+    product_lists = await asyncio.gather(
+        *(
+            scheduler.run(urlparse(url).netloc, _crawl_wishlist, url, pool)
+            for url in AMAZON_WISHLIST_URLS
+        )
+    )
 
-            products = _extract_products_from_page(driver)
-            all_products.extend(products)
+    all_products = _dedupe_products(product_lists)
 
-            logger.info("Extracted %d products", len(products))
+    duplicates = sum(len(products) for products in product_lists) - len(all_products)
+    if duplicates:
+        logger.info("Dropped %d products found on more than one wishlist", duplicates)
 
     if not all_products:
         logger.warning("No Amazon products found — skipping DB update")
         return
 
-    product_table = Table("product", MetaData(), autoload_with=engine)
-
-    with engine.begin() as connection:
-        connection.execute(text("DELETE FROM product WHERE store = 'Amazon'"))
-        connection.execute(product_table.insert(), all_products)
-
-    logger.info("Amazon product list update complete")
+    added, renamed, removed = await asyncio.to_thread(
+        sync_products, engine, "Amazon", all_products
+    )
+
+    logger.info(
+        "Amazon product list update complete "
+        "(%d added, %d renamed, %d removed, %d unchanged)",
+        added,
+        renamed,
+        removed,
+        len(all_products) - added - renamed,
+    )
+
+
+def update_amazon_product_list(engine: Engine, *, workers: int = MAX_WORKERS) -> None:
+    """Run the Amazon product list update (see run_scrape_jobs)."""
+    asyncio.run(
+        run_scrape_jobs(
+            partial(update_amazon_product_list_async, engine),
+            workers=workers,
+        )
+    )
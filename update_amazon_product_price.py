@@ -1,146 +1,384 @@
 #!/usr/bin/env python3
 
+import asyncio
 import logging
-from time import sleep
-from typing import Dict, List
+from functools import partial
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
 
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+import requests
+from bs4 import BeautifulSoup
 
-from sqlalchemy import MetaData, Table, text
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from sqlalchemy import text
 from sqlalchemy.engine import Engine
 
-from selenium_utils import create_webdriver, create_wait, safe_get, random_delay
+from db.price_writer import PriceWriter
+
+from http_utils import create_http_session, fetch_html, is_bot_wall
+from scrape_scheduler import (
+    MAX_WORKERS,
+    RetryStats,
+    ScrapeScheduler,
+    TransientScrapeError,
+    run_scrape_jobs,
+)
+from selenium_utils import DriverPool, create_wait, safe_get
 
 logger = logging.getLogger(__name__)
 
 
 AMAZON_PRODUCT_URL_BASE = "https://amazon.com/dp/"
-MAX_RETRIES = 3
-RETRY_DELAY_SECONDS = 5
+AMAZON_HOST = urlparse(AMAZON_PRODUCT_URL_BASE).netloc
+
+# A page with only one kind of price candidate is read once its price /
+# format containers have been unchanged for PRICE_SETTLE_MS, and at the
+# latest PRICE_MAX_WAIT_MS after candidates first appear
+PRICE_SETTLE_MS = 750
+PRICE_MAX_WAIT_MS = 4000
+
+# Containers the "books" format toggles render into
+FORMAT_CONTAINER_SELECTOR = "#tmmSwatches, #formats"
+
+
+def _select_format_price(formats: List[Dict[str, str]]) -> Optional[float]:
+    """
+    Pick a price from the "books" format toggles.
+
+    Each entry holds the toggle's `title`, `price` and (optional) `extra`
+    message text. Preference order:
+        Kindle > Paperback > Hardcover
+
+    Returns None if the preferred toggle's price cannot be read
+    (PriceWriter stores that as MISSING_PRICE).
+    """
+    prices: Dict[str, Optional[float]] = {}
+
+    for fmt in formats:
+        title = fmt["title"]
+
+        try:
+            prices[title] = float(fmt["price"].split("$")[-1])
+        except (TypeError, ValueError):
+            prices[title] = None
+
+        extra = fmt.get("extra")
+        if extra and "$" in extra:
+            prices[title] = float(extra.split("$")[1].split()[0])
+
+    return prices.get(
+        "Kindle",
+        prices.get("Paperback", prices.get("Hardcover", -1.0)),
+    )
+
+
+def _whole_fraction_to_price(whole: str, fraction: str) -> float:
+    """Combine `a-price-whole` / `a-price-fraction` text into a float."""
+    return float(whole.replace(",", "").strip().rstrip(".") + "." + fraction.strip())
+
+
+# Collects every price candidate on a product page in one round-trip.
+# Returns null while the page is still rendering its prices:
+#
+#   - both format toggles and box groups present: read now
+#   - a format container without toggles yet: wait, it is a book page
+#     whose toggles render after its boxes (common with the eager
+#     page-load strategy)
+#   - otherwise: read once the watched containers have been unchanged
+#     for `settleMs`
+#
+# Only the format containers and box groups are watched, so unrelated
+# activity (countdowns, carousels) never holds the read back, and once
+# `maxWaitMs` have passed since candidates first appeared whatever is
+# present is returned. State lives on window, so it resets per page.
+_PRICE_CANDIDATES_SCRIPT = """
+const [settleMs, maxWaitMs, formatContainerSelector] = arguments;
+
+const text = (root, selector) => {
+    const el = root.querySelector(selector);
+    return el ? el.innerText : null;
+};
+
+const toggles = document.querySelectorAll(
+    ".a-button.a-spacing-none.a-button-toggle.format"
+);
+const boxGroups = document.querySelectorAll(".a-box-group");
+
+if (!toggles.length && !boxGroups.length) {
+    return null;
+}
+
+const candidates = () => ({
+    formats: Array.from(toggles).map((toggle) => ({
+        title: text(toggle, ".slot-title"),
+        price: text(toggle, ".slot-price"),
+        extra: text(toggle, ".slot-extraMessage"),
+    })),
+    boxes: Array.from(boxGroups)
+        .filter((box) => box.querySelector(".a-price-whole"))
+        .map((box) => ({
+            whole: text(box, ".a-price-whole"),
+            fraction: text(box, ".a-price-fraction"),
+        })),
+});
+
+if (toggles.length && boxGroups.length) {
+    return candidates();
+}
+
+const now = Date.now();
+if (window.__priceCandidates === undefined) {
+    const state = { firstSeen: now, lastChange: now, watched: new WeakSet() };
+    state.observer = new MutationObserver(() => {
+        state.lastChange = Date.now();
+    });
+    window.__priceCandidates = state;
+}
+const state = window.__priceCandidates;
+
+const formatContainers = document.querySelectorAll(formatContainerSelector);
+for (const el of [...formatContainers, ...boxGroups]) {
+    if (!state.watched.has(el)) {
+        state.watched.add(el);
+        state.observer.observe(el, { childList: true, subtree: true });
+    }
+}
+
+if (now - state.firstSeen >= maxWaitMs) {
+    return candidates();
+}
+
+if (!toggles.length && formatContainers.length) {
+    return null;
+}
+
+return now - state.lastChange >= settleMs ? candidates() : null;
+"""
+
+
+def _price_from_candidates(candidates: Dict) -> float:
+    """
+    Pick the most relevant price from a page's price candidates.
+
+    `candidates` holds `formats` ("books" format toggles: title / price /
+    extra text) and `boxes` ("non-books" a-price-whole / a-price-fraction
+    text). Toggles win when present; otherwise the first priced box.
+
+    Returns:
+        float: price, or -1.0 if no candidate holds a price
+    """
+    formats = [
+        fmt
+        for fmt in candidates.get("formats") or []
+        if fmt.get("title") and fmt.get("price") is not None
+    ]
+
+    if formats:  # "books" format
+        return _select_format_price(
+            [{**fmt, "title": fmt["title"].strip()} for fmt in formats]
+        )
+
+    for box in candidates.get("boxes") or []:  # "non-books" format
+        if box.get("whole") and box.get("fraction"):
+            return _whole_fraction_to_price(box["whole"], box["fraction"])
+
+    return -1.0
 
 
 def _extract_price_from_page(wait) -> float:
     """
     Extract the most relevant price from an Amazon product page.
 
+    All candidates are read with a single execute_script per poll, once
+    the page has them all (see _PRICE_CANDIDATES_SCRIPT).
+
     Preference order:
         Kindle > Paperback > Hardcover
     """
-    try:  # First try "books" format
-        toggles = wait.until(
-            EC.presence_of_all_elements_located(
-                (By.CLASS_NAME, "a-button.a-spacing-none.a-button-toggle.format")
-            )
+    candidates = wait.until(
+        lambda driver: driver.execute_script(
+            _PRICE_CANDIDATES_SCRIPT,
+            PRICE_SETTLE_MS,
+            PRICE_MAX_WAIT_MS,
+            FORMAT_CONTAINER_SELECTOR,
         )
+    )
 
-    except:  # Then check for "non-books" format
-        price = -1.0
+    return _price_from_candidates(candidates)
 
-        box_groups = wait.until(
-            EC.presence_of_all_elements_located((By.CLASS_NAME, "a-box-group"))
-        )
 
-        for box_group in box_groups:
-            if box_group.find_elements(By.CLASS_NAME, "a-price-whole"):
-                price = float(
-                    box_group.find_elements(By.CLASS_NAME, "a-price-whole")[0].text
-                    + "."
-                    + box_group.find_elements(By.CLASS_NAME, "a-price-fraction")[0].text
-                )
-                break
+def _extract_price_from_html(html: str) -> Optional[float]:
+    """
+    Browserless counterpart of `_extract_price_from_page`.
 
-        return price
+    Applies the same rules to the page's initial HTML.
 
-    else:  # Execute "books" format logic
-        prices: Dict[str, float] = {}
+    Returns:
+        float: price, or None if the HTML has no recognizable price
+    """
+    soup = BeautifulSoup(html, "html.parser")
 
-        for toggle in toggles:
-            title = toggle.find_element(By.CLASS_NAME, "slot-title").text
+    def text(root, selector: str) -> Optional[str]:
+        el = root.select_one(selector)
+        return el.get_text(" ", strip=True) if el is not None else None
 
-            price_text = toggle.find_element(By.CLASS_NAME, "slot-price").text
+    candidates = {
+        "formats": [
+            {
+                "title": text(toggle, ".slot-title"),
+                "price": text(toggle, ".slot-price"),
+                "extra": text(toggle, ".slot-extraMessage"),
+            }
+            for toggle in soup.select(".a-button.a-spacing-none.a-button-toggle.format")
+        ],
+        "boxes": [
+            {
+                "whole": box.select_one(".a-price-whole").get_text(),
+                "fraction": text(box, ".a-price-fraction"),
+            }
+            for box in soup.select(".a-box-group")
+            if box.select_one(".a-price-whole") is not None
+        ],
+    }
 
-            try:
-                prices[title] = float(price_text.split("$")[-1])
-            except (TypeError, ValueError):
-                prices[title] = None
+    if not candidates["formats"] and not candidates["boxes"]:
+        return None
 
-            extra_messages = toggle.find_elements(By.CLASS_NAME, "slot-extraMessage")
-            if extra_messages and "$" in extra_messages[0].text:
-                prices[title] = float(extra_messages[0].text.split("$")[1].split()[0])
+    try:
+        return _price_from_candidates(candidates)
+    except (IndexError, ValueError):
+        return None
 
-        return prices.get(
-            "Kindle",
-            prices.get("Paperback", prices.get("Hardcover", -1.0)),
-        )
 
+def _get_product_price_http(url: str, session: requests.Session) -> Optional[float]:
+    """
+    Fast path: fetch and parse the product page without a browser.
+
+    Returns:
+        float: price, or None if the caller should fall back to Selenium
+    """
+    html = fetch_html(session, url)
+
+    if html is None:
+        return None
+
+    if is_bot_wall(html):
+        logger.info("Bot wall detected for %s, falling back to Selenium", url)
+        return None
 
-def get_product_price(url: str) -> float:
+    price = _extract_price_from_html(html)
+
+    if price is None or price < 0:
+        logger.info("Fast parse failed for %s, falling back to Selenium", url)
+        return None
+
+    return price
+
+
+def get_product_price(
+    url: str,
+    pool: DriverPool,
+    session: Optional[requests.Session] = None,
+) -> float:
     """
     Retrieve a product price from an Amazon product page.
 
-    Returns:
-        float: price, or -1.0 after retry exhaustion
+    If `session` is given, the plain-HTTP fast path is tried first and a
+    browser is only leased when it cannot produce a price.
+
+    Raises:
+        TransientScrapeError: if the page timed out or the browser failed
+            (the scheduler defers and retries it)
     """
-    with create_webdriver() as driver:
-        for attempt in range(1, MAX_RETRIES + 1):
-            try:
-                wait = create_wait(driver)
-                safe_get(driver, url)
-                random_delay()
-                return _extract_price_from_page(wait)
-
-            except TimeoutException:
-                logger.warning(
-                    "Timeout loading %s (attempt %d/%d)",
-                    url,
-                    attempt,
-                    MAX_RETRIES,
-                )
-
-                if attempt == MAX_RETRIES:
-                    logger.error("Max retries exceeded for %s", url)
-                    return -1.0
-
-                sleep(RETRY_DELAY_SECONDS)
-
-
-def update_amazon_product_price(engine: Engine, report_record: Dict) -> None:
+    if session is not None:
+        price = _get_product_price_http(url, session)
+        if price is not None:
+            return price
+
+    try:
+        # Inside the try: leasing may start a Chrome (first use, failed
+        # health check, recycle), which can fail like any page load
+        with pool.lease() as driver:
+            wait = create_wait(driver)
+            safe_get(driver, url, retries=1)
+            return _extract_price_from_page(wait)
+
+    except TimeoutException as exc:
+        logger.warning("Timeout loading %s", url)
+        raise TransientScrapeError(url) from exc
+
+    except WebDriverException as exc:
+        # net::ERR_*, crashed tab, unreachable browser, Chrome failing to
+        # start: the pool replaces a dead driver, so a later attempt gets a
+        # fresh one
+        logger.warning("Browser error loading %s: %s", url, exc.msg)
+        raise TransientScrapeError(url) from exc
+
+
+async def update_amazon_product_price_async(
+    engine: Engine,
+    report_record: Dict,
+    scheduler: ScrapeScheduler,
+    pool: DriverPool,
+) -> Optional[RetryStats]:
     """
     Fetch prices for all Amazon products and store them in the database.
+
+    Products are fetched concurrently under the scheduler's Amazon pacing.
+    Transient failures are retried after the first pass. Prices are
+    streamed to the database in batches as they arrive.
+
+    Returns:
+        RetryStats: fetch / retry counts, or None if there were no products
     """
     logger.info("Starting Amazon product price update")
 
     report_id = report_record.get("id")
 
-    with engine.begin() as connection:
-        result = connection.execute(
-            text("SELECT id FROM product WHERE store = 'Amazon'")
-        )
-        product_ids = [row.id for row in result]
+    def load_product_ids() -> List[str]:
+        with engine.begin() as connection:
+            result = connection.execute(
+                text("SELECT id FROM product WHERE store = 'Amazon'")
+            )
+            return [row.id for row in result]
+
+    product_ids = await asyncio.to_thread(load_product_ids)
 
     if not product_ids:
         logger.warning("No Amazon products found — skipping price update")
-        return
+        return None
 
-    price_rows: List[Dict[str, float]] = []
+    with PriceWriter(engine, report_id) as writer, create_http_session(
+        pool_size=pool.size
+    ) as session:
 
-    for product_id in product_ids:
-        price = get_product_price(AMAZON_PRODUCT_URL_BASE + product_id)
+        def fetch(product_id: str) -> float:
+            return get_product_price(
+                AMAZON_PRODUCT_URL_BASE + product_id, pool, session
+            )
 
-        price_rows.append(
-            {
-                "report_id": report_id,
-                "product_id": product_id,
-                "price": price,
-            }
-        )
+        async def record(product_id: str, price: float) -> None:
+            await asyncio.to_thread(writer.add, product_id, price)
 
-    with engine.begin() as connection:
-        connection.execute(
-            Table("price", MetaData(), autoload_with=engine).insert(),
-            price_rows,
+        _, stats = await scheduler.map(
+            AMAZON_HOST, fetch, product_ids, default=-1.0, on_result=record
         )
 
-    logger.info("Amazon product price update complete")
+        await asyncio.to_thread(writer.flush)
+
+    logger.info("Amazon product price update complete (%s)", stats)
+
+    return stats
+
+
+def update_amazon_product_price(
+    engine: Engine, report_record: Dict, *, workers: int = MAX_WORKERS
+) -> None:
+    """Run the Amazon price update on its own (see run_scrape_jobs)."""
+    asyncio.run(
+        run_scrape_jobs(
+            partial(update_amazon_product_price_async, engine, report_record),
+            workers=workers,
+        )
+    )
@@ -1,27 +1,38 @@
 #!/usr/bin/env python3
 
+import asyncio
 import logging
-from time import sleep
-from typing import Dict, List
+from functools import partial
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
 
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 
-from sqlalchemy import MetaData, Table, text
+from sqlalchemy import text
 from sqlalchemy.engine import Engine
 
-from selenium_utils import create_webdriver, create_wait, safe_get, random_delay
+from db.price_writer import PriceWriter
+
+from scrape_scheduler import (
+    MAX_WORKERS,
+    RetryStats,
+    ScrapeScheduler,
+    TransientScrapeError,
+    run_scrape_jobs,
+)
+from selenium_utils import DriverPool, create_wait, safe_get
 
 logger = logging.getLogger(__name__)
 
 
-APPLETV_PRODUCT_URL_BASE = [
-    "https://www.cheapcharts.com/us/itunes/movies/",
-    "https://www.cheapcharts.com/us/itunes/seasons/",
-]
-MAX_RETRIES = 3
-RETRY_DELAY_SECONDS = 5
+# URL kind -> base URL, in the order they are tried for unresolved products
+APPLETV_PRODUCT_URL_BASE = {
+    "movies": "https://www.cheapcharts.com/us/itunes/movies/",
+    "seasons": "https://www.cheapcharts.com/us/itunes/seasons/",
+}
+APPLETV_HOST = urlparse(APPLETV_PRODUCT_URL_BASE["movies"]).netloc
 
 
 def _extract_price_from_page(wait) -> float:
@@ -40,75 +51,156 @@ def _extract_price_from_page(wait) -> float:
     return price
 
 
-def get_product_price(url: str) -> float:
+def get_product_price(url: str, pool: DriverPool) -> float:
     """
     Retrieve a product price from an CheapCharts product page.
 
     Returns:
-        float: price, or -1.0 after retry exhaustion
-    """
-    with create_webdriver() as driver:
-        for attempt in range(1, MAX_RETRIES + 1):
-            try:
-                wait = create_wait(driver)
-                safe_get(driver, url)
-                random_delay()
-                return _extract_price_from_page(wait)
-
-            except TimeoutException:
-                logger.warning(
-                    "Timeout loading %s (attempt %d/%d)",
-                    url,
-                    attempt,
-                    MAX_RETRIES,
-                )
-
-                if attempt == MAX_RETRIES:
-                    logger.error("Max retries exceeded for %s", url)
-                    return -1.0
+        float: price, or -1.0 if the page has no price
 
-                sleep(RETRY_DELAY_SECONDS)
-
-
-def update_appletv_product_price(engine: Engine, report_record: Dict) -> None:
+    Raises:
+        TransientScrapeError: if the page timed out or the browser failed
+            (the scheduler defers and retries it)
+    """
+    try:
+        # Inside the try: leasing may start a Chrome (first use, failed
+        # health check, recycle), which can fail like any page load
+        with pool.lease() as driver:
+            wait = create_wait(driver)
+            safe_get(driver, url, retries=1)
+            return _extract_price_from_page(wait)
+
+    except TimeoutException as exc:
+        logger.warning("Timeout loading %s", url)
+        raise TransientScrapeError(url) from exc
+
+    except WebDriverException as exc:
+        # net::ERR_*, crashed tab, unreachable browser, Chrome failing to
+        # start: the pool replaces a dead driver, so a later attempt gets a
+        # fresh one
+        logger.warning("Browser error loading %s: %s", url, exc.msg)
+        raise TransientScrapeError(url) from exc
+
+
+def _url_kinds_to_try(cached_kind: Optional[str]) -> List[str]:
+    """Cached kind first (if any), then the remaining kinds in default order."""
+    kinds = list(APPLETV_PRODUCT_URL_BASE)
+
+    if cached_kind in APPLETV_PRODUCT_URL_BASE:
+        kinds.remove(cached_kind)
+        kinds.insert(0, cached_kind)
+
+    return kinds
+
+
+async def update_appletv_product_price_async(
+    engine: Engine,
+    report_record: Dict,
+    scheduler: ScrapeScheduler,
+    pool: DriverPool,
+) -> Optional[RetryStats]:
     """
     Fetch prices for all Apple TV products and store them in the database.
+
+    Products are fetched concurrently under the scheduler's CheapCharts
+    pacing. Transient failures are retried after the first pass. Prices
+    are streamed to the database in batches as they arrive.
+
+    Returns:
+        RetryStats: fetch / retry counts, or None if there were no products
     """
     logger.info("Starting Apple TV product price update")
 
     report_id = report_record.get("id")
 
-    with engine.begin() as connection:
-        result = connection.execute(
-            text("SELECT id FROM product WHERE store = 'Apple TV'")
-        )
-        product_ids = [row.id for row in result]
+    def load_products() -> Dict[str, Optional[str]]:
+        with engine.begin() as connection:
+            result = connection.execute(
+                text("SELECT id, url_kind FROM product WHERE store = 'Apple TV'")
+            )
+            return {row.id: row.url_kind for row in result}
+
+    cached_kinds = await asyncio.to_thread(load_products)
+    product_ids = list(cached_kinds)
 
     if not product_ids:
         logger.warning("No Apple TV products found — skipping price update")
-        return
+        return None
+
+    resolved_kinds: Dict[str, Optional[str]] = {}
 
-    price_rows: List[Dict[str, float]] = []
+    async def fetch(product_id: str) -> float:
+        timed_out = None
 
-    for product_id in product_ids:
-        for url in APPLETV_PRODUCT_URL_BASE:
-            price = get_product_price(url + product_id)
+        for kind in _url_kinds_to_try(cached_kinds[product_id]):
+            url = APPLETV_PRODUCT_URL_BASE[kind] + product_id
+
+            try:
+                price = await scheduler.attempt(
+                    APPLETV_HOST, get_product_price, url, pool
+                )
+            except TransientScrapeError as exc:
+                timed_out = exc
+                continue
 
             if price > -1.0:
-                break
-
-        price_rows.append(
-            {
-                "report_id": report_id,
-                "product_id": product_id,
-                "price": price,
-            }
-        )
+                resolved_kinds[product_id] = kind
+                return price
+
+        # Don't trust a miss if any kind timed out; defer the whole product
+        if timed_out is not None:
+            raise timed_out
+
+        resolved_kinds[product_id] = None
+        return -1.0
 
-    with engine.begin() as connection:
-        connection.execute(
-            Table("price", MetaData(), autoload_with=engine).insert(),
-            price_rows,
+    with PriceWriter(engine, report_id) as writer:
+
+        async def record(product_id: str, price: float) -> None:
+            await asyncio.to_thread(writer.add, product_id, price)
+
+        _, stats = await scheduler.map_deferred(
+            fetch,
+            product_ids,
+            default=-1.0,
+            label="Apple TV products",
+            on_result=record,
         )
 
-    logger.info("Apple TV product price update complete")
+        await asyncio.to_thread(writer.flush)
+
+    # Persist new resolutions; a product that failed every kind is reset
+    # so the next run probes all kinds again
+    kind_updates = [
+        {"id": product_id, "url_kind": kind}
+        for product_id, kind in resolved_kinds.items()
+        if kind != cached_kinds[product_id]
+    ]
+
+    if kind_updates:
+        logger.info("Updating cached URL kind for %d products", len(kind_updates))
+
+        def update_kinds() -> None:
+            with engine.begin() as connection:
+                connection.execute(
+                    text("UPDATE product SET url_kind = :url_kind WHERE id = :id"),
+                    kind_updates,
+                )
+
+        await asyncio.to_thread(update_kinds)
+
+    logger.info("Apple TV product price update complete (%s)", stats)
+
+    return stats
+
+
+def update_appletv_product_price(
+    engine: Engine, report_record: Dict, *, workers: int = MAX_WORKERS
+) -> None:
+    """Run the Apple TV price update on its own (see run_scrape_jobs)."""
+    asyncio.run(
+        run_scrape_jobs(
+            partial(update_appletv_product_price_async, engine, report_record),
+            workers=workers,
+        )
+    )